@@ -1,3 +1,23 @@
+class AtlasSprite {
+    // One frame of a sprite atlas page; drawn with Game.drawSprite()
+    constructor(page, frame) {
+        this.page = page;
+        this.frame = frame;
+    }
+    
+    get complete() {
+        return this.page.complete;
+    }
+    
+    get width() {
+        return this.frame.sourceW;
+    }
+    
+    get height() {
+        return this.frame.sourceH;
+    }
+}
+
 class Game {
     constructor() {
         this.canvas = document.getElementById('gameCanvas');
@@ -5,13 +25,10 @@ class Game {
         this.width = this.canvas.width;
         this.height = this.canvas.height;
         
-        // Load Saitama images for walking animation
-        this.saitamaStandImage = new Image();
-        this.saitamaStandImage.src = 'images/characters/Saitama_stand.png';
-        this.saitamaWalkImage = new Image();
-        this.saitamaWalkImage.src = 'images/characters/Saitama_walk.png';
-        this.saitamaPunchingImage = new Image();
-        this.saitamaPunchingImage.src = 'images/characters/Saitama_punching.png';
+        // Saitama images for walking animation (loaded in init())
+        this.saitamaStandImage = null;
+        this.saitamaWalkImage = null;
+        this.saitamaPunchingImage = null;
         this.saitamaStandLoaded = false;
         this.saitamaWalkLoaded = false;
         this.saitamaPunchingLoaded = false;
@@ -26,6 +43,11 @@ class Game {
         this.bossNames = ['Lord Boros', 'Crablante', 'Deep Sea King', 'Volcano Lord', 'Meteor'];
         this.bossImagesLoaded = 0;
         
+        // Sprites come from the packed atlas (one request and decode per page);
+        // ?sprites=files loads each image on its own, as does a missing atlas
+        this.spriteMode = new URLSearchParams(window.location.search).get('sprites') === 'files' ? 'files' : 'atlas';
+        this.spriteAtlasUrl = 'images/atlas/characters.json';
+        
         // City image (will be set by menu selection)
         this.cityImage = null;
         this.cityLoaded = false;
@@ -137,36 +159,101 @@ class Game {
     }
     
     init() {
-        // Load Saitama images
-        this.saitamaStandImage.onload = () => {
-            this.saitamaStandLoaded = true;
-        };
+        // Load Saitama and boss images
+        if (this.spriteMode === 'atlas') {
+            this.loadSpriteAtlas(this.spriteAtlasUrl).catch((error) => {
+                console.log('Sprite atlas unavailable, loading single images:', error);
+                this.loadSpriteFiles();
+            });
+        } else {
+            this.loadSpriteFiles();
+        }
         
-        this.saitamaWalkImage.onload = () => {
-            this.saitamaWalkLoaded = true;
+        // Setup menu event listeners (with delay to ensure DOM is ready)
+        setTimeout(() => {
+            this.setupMenuListeners();
+        }, 100);
+        
+        // Start rendering loop (for menu background)
+        this.gameLoop();
+    }
+    
+    loadSpriteFiles() {
+        const load = (src, onload) => {
+            const img = new Image();
+            img.onload = onload;
+            img.src = src;
+            return img;
         };
         
-        this.saitamaPunchingImage.onload = () => {
+        this.saitamaStandImage = load('images/characters/Saitama_stand.png', () => {
+            this.saitamaStandLoaded = true;
+        });
+        this.saitamaWalkImage = load('images/characters/Saitama_walk.png', () => {
+            this.saitamaWalkLoaded = true;
+        });
+        this.saitamaPunchingImage = load('images/characters/Saitama_punching.png', () => {
             this.saitamaPunchingLoaded = true;
-        };
+        });
         
-        // Load boss images
-        this.bossImageFiles.forEach((filename, index) => {
-            const img = new Image();
-            img.src = `images/characters/bosses/${filename}`;
-            img.onload = () => {
+        this.bossImageFiles.forEach((filename) => {
+            this.bossImages[filename] = load(`images/characters/bosses/${filename}`, () => {
                 this.bossImagesLoaded++;
-            };
-            this.bossImages[filename] = img;
+            });
         });
+    }
+    
+    async loadSpriteAtlas(url) {
+        // The frame map is tiny and revalidated; its pages are content-hashed and cached for good
+        const response = await fetch(url, { cache: 'no-cache' });
+        if (!response.ok) {
+            throw new Error(`${url}: HTTP ${response.status}`);
+        }
+        const atlas = await response.json();
+        const base = url.slice(0, url.lastIndexOf('/') + 1);
+        
+        // Decoded up front, so the first frame of a level doesn't pay for it
+        const pages = await Promise.all(atlas.pages.map((name) => {
+            const page = new Image();
+            page.src = base + name;
+            return page.decode().then(() => page);
+        }));
+        
+        const sprite = (name) => {
+            const frame = atlas.frames[name];
+            if (!frame) {
+                throw new Error(`${url} has no frame ${name}`);
+            }
+            return new AtlasSprite(pages[frame.page], frame);
+        };
         
-        // Setup menu event listeners (with delay to ensure DOM is ready)
-        setTimeout(() => {
-            this.setupMenuListeners();
-        }, 100);
+        // Every frame is looked up before any is used, so a bad atlas falls back cleanly
+        const stand = sprite('Saitama_stand.png');
+        const walk = sprite('Saitama_walk.png');
+        const punching = sprite('Saitama_punching.png');
+        const bosses = this.bossImageFiles.map((filename) => sprite(`bosses/${filename}`));
         
-        // Start rendering loop (for menu background)
-        this.gameLoop();
+        this.saitamaStandImage = stand;
+        this.saitamaWalkImage = walk;
+        this.saitamaPunchingImage = punching;
+        this.saitamaStandLoaded = this.saitamaWalkLoaded = this.saitamaPunchingLoaded = true;
+        this.bossImageFiles.forEach((filename, index) => {
+            this.bossImages[filename] = bosses[index];
+        });
+        this.bossImagesLoaded = this.bossImageFiles.length;
+    }
+    
+    drawSprite(sprite, x, y, width, height) {
+        // A plain image, or one frame of an atlas page scaled as the whole original would be
+        if (!(sprite instanceof AtlasSprite)) {
+            this.ctx.drawImage(sprite, x, y, width, height);
+            return;
+        }
+        const frame = sprite.frame;
+        const scaleX = width / frame.sourceW;
+        const scaleY = height / frame.sourceH;
+        this.ctx.drawImage(sprite.page, frame.x, frame.y, frame.w, frame.h,
+            x + frame.offsetX * scaleX, y + frame.offsetY * scaleY, frame.w * scaleX, frame.h * scaleY);
     }
     
     setupMenuListeners() {
@@ -1209,7 +1296,7 @@ class Game {
                 imageWidth = player.width * 1.2;
                 imageHeight = player.height * 1.2;
                 // Adjust position to keep it centered
-                this.ctx.drawImage(currentSaitamaImage, 
+                this.drawSprite(currentSaitamaImage, 
                     player.x - (imageWidth - player.width) / 2, 
                     player.y - (imageHeight - player.height) / 2, 
                     imageWidth, imageHeight);
@@ -1217,9 +1304,9 @@ class Game {
                 // If punching image not loaded, add a slight forward lean
                 this.ctx.translate(player.x + imageWidth/2, player.y + imageHeight/2);
                 this.ctx.rotate(0.1); // Slight forward lean
-                this.ctx.drawImage(currentSaitamaImage, -imageWidth/2, -imageHeight/2, imageWidth, imageHeight);
+                this.drawSprite(currentSaitamaImage, -imageWidth/2, -imageHeight/2, imageWidth, imageHeight);
             } else {
-                this.ctx.drawImage(currentSaitamaImage, player.x, player.y, imageWidth, imageHeight);
+                this.drawSprite(currentSaitamaImage, player.x, player.y, imageWidth, imageHeight);
             }
             
             this.ctx.restore();
@@ -1335,11 +1422,11 @@ class Game {
                 if (boss.image && boss.image.complete) {
                     // Draw boss image with trail effect
                     this.ctx.globalAlpha = 0.8;
-                    this.ctx.drawImage(boss.image, -boss.width/2, -boss.height/2, boss.width, boss.height);
+                    this.drawSprite(boss.image, -boss.width/2, -boss.height/2, boss.width, boss.height);
                     
                     // Add motion blur effect
                     this.ctx.globalAlpha = 0.4;
-                    this.ctx.drawImage(boss.image, 
+                    this.drawSprite(boss.image, 
                         -boss.width/2 - boss.flyVelocityX * 0.5, 
                         -boss.height/2 - boss.flyVelocityY * 0.5, 
                         boss.width, boss.height);
@@ -1360,7 +1447,7 @@ class Game {
                 this.ctx.shadowBlur = 25;
                 this.ctx.globalAlpha = 0.6;
                 if (boss.image && boss.image.complete) {
-                    this.ctx.drawImage(boss.image, -boss.width/2, -boss.height/2, boss.width, boss.height);
+                    this.drawSprite(boss.image, -boss.width/2, -boss.height/2, boss.width, boss.height);
                 }
             } else {
                 // Apply meteor shake effect
@@ -1373,7 +1460,7 @@ class Game {
                 // Draw normal boss
                 if (boss.image && boss.image.complete) {
                     // Draw boss image
-                    this.ctx.drawImage(boss.image, boss.x + shakeX, boss.y + shakeY, boss.width, boss.height);
+                    this.drawSprite(boss.image, boss.x + shakeX, boss.y + shakeY, boss.width, boss.height);
                     
                     // Special boss glow effects
                     let glowColor = '#FF0000';
@@ -1393,7 +1480,7 @@ class Game {
                     this.ctx.shadowColor = glowColor;
                     this.ctx.shadowBlur = glowIntensity;
                     this.ctx.globalAlpha = glowAlpha;
-                    this.ctx.drawImage(boss.image, boss.x + shakeX, boss.y + shakeY, boss.width, boss.height);
+                    this.drawSprite(boss.image, boss.x + shakeX, boss.y + shakeY, boss.width, boss.height);
                     
                     // Extra effects
                     if (boss.isVolcano) {
@@ -1401,13 +1488,13 @@ class Game {
                         this.ctx.shadowColor = '#FFFF00';
                         this.ctx.shadowBlur = 15;
                         this.ctx.globalAlpha = 0.3;
-                        this.ctx.drawImage(boss.image, boss.x + shakeX, boss.y + shakeY, boss.width, boss.height);
+                        this.drawSprite(boss.image, boss.x + shakeX, boss.y + shakeY, boss.width, boss.height);
                     } else if (boss.isMeteor) {
                         // Add blue-white core glow
                         this.ctx.shadowColor = '#87CEEB';
                         this.ctx.shadowBlur = 20;
                         this.ctx.globalAlpha = 0.5;
-                        this.ctx.drawImage(boss.image, boss.x + shakeX, boss.y + shakeY, boss.width, boss.height);
+                        this.drawSprite(boss.image, boss.x + shakeX, boss.y + shakeY, boss.width, boss.height);
                     }
                 } else {
                     // Fallback to emoji
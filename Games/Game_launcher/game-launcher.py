@@ -1,20 +1,52 @@
 #!/usr/bin/env python3
 """
 Game Launcher - Master Server
-Hosts all games directly on their designated ports
-Serves the game selector on http://localhost:8000
+Serves the game selector on http://localhost:8000 and hosts every game
+behind that one server (/games/<game>/), on its own port, or in its own
+supervised process
 """
 
 import threading
 import time
 import os
+import json
 import signal
+import subprocess
 import sys
-from flask import Flask, render_template_string, jsonify, send_from_directory
+import urllib.request
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, render_template_string, jsonify, request
+from werkzeug.serving import make_server
+from werkzeug.utils import redirect
+from werkzeug.wrappers import Response
+from werkzeug.wsgi import ClosingIterator
+
+from static_assets import AssetManifest, images
+from sprite_atlas import ensure_atlas
 
 # Create the main Flask app for the game selector
 app = Flask(__name__)
 
+MASTER_PORT = 8000
+
+# Serving mode: 'single' hosts every game in one server with one worker pool,
+# 'ports' runs a separate dev server per game on its own port (the old way),
+# 'processes' runs each game as a supervised child process on its own port
+LAUNCHER_MODE = os.environ.get('ARCADE_MODE', 'single').lower()
+LEGACY_PORTS = os.environ.get('ARCADE_LEGACY_PORTS', '1') == '1'  # single mode: also answer on each game's port
+WORKER_THREADS = int(os.environ.get('ARCADE_THREADS', 16))          # single mode: threads shared by all games
+READY_TIMEOUT = float(os.environ.get('ARCADE_READY_TIMEOUT', 5))    # seconds a game gets to answer /health
+DRAIN_TIMEOUT = float(os.environ.get('ARCADE_DRAIN_TIMEOUT', 5))    # seconds in-flight requests get on stop
+
+# processes mode: worker threads per game process, plus per-game overrides, e.g.
+#   {"one-punch-man": {"workers": 8, "cpus": [2, 3]}, "joke-generator": {"cpus": [1]}}
+PROCESS_WORKERS = int(os.environ.get('ARCADE_WORKERS', 4))
+PROCESS_CONFIG = json.loads(os.environ.get('ARCADE_PROCESSES') or '{}')
+RESTART_BACKOFF = float(os.environ.get('ARCADE_RESTART_BACKOFF', 0.5))       # first restart delay, doubling
+RESTART_BACKOFF_MAX = float(os.environ.get('ARCADE_RESTART_BACKOFF_MAX', 30))
+STABLE_AFTER = 30  # seconds a restarted process must stay up before the backoff resets
+
 # Game server configurations
 GAMES = {
     'tower-defense': {
@@ -24,6 +56,8 @@ GAMES = {
         'main_file': 'index.html',
         'status': 'stopped',
         'app': None,
+        'server': None,
+        'process': None,
         'thread': None
     },
     'joke-generator': {
@@ -31,8 +65,14 @@ GAMES = {
         'port': 8002,
         'directory': '../random_joke_generator/python',
         'main_file': 'index.html',
+        # Has its own server (with the joke API), run as a child process on its
+        # own port in every mode: the page calls /api/joke on absolute paths
+        'server_script': 'server.py',
+        'health_path': '/api/health',
         'status': 'stopped',
         'app': None,
+        'server': None,
+        'process': None,
         'thread': None
     },
     'card-matching': {
@@ -42,6 +82,8 @@ GAMES = {
         'main_file': 'emoji-memory-game.html',
         'status': 'stopped',
         'app': None,
+        'server': None,
+        'process': None,
         'thread': None
     },
     'tic-tac-toe': {
@@ -51,6 +93,8 @@ GAMES = {
         'main_file': 'index.html',
         'status': 'stopped',
         'app': None,
+        'server': None,
+        'process': None,
         'thread': None
     },
     'snake-game': {
@@ -60,6 +104,8 @@ GAMES = {
         'main_file': 'index.html',
         'status': 'stopped',
         'app': None,
+        'server': None,
+        'process': None,
         'thread': None
     },
     'one-punch-man': {
@@ -67,8 +113,16 @@ GAMES = {
         'port': 8006,
         'directory': 'Game-side_scroller_one_punch_man',
         'main_file': 'index.html',
+        # Saitama and the bosses, packed into images/atlas/characters.json + pages
+        'atlases': [{
+            'output': 'images/atlas/characters',
+            'root': 'images/characters',
+            'include': ['Saitama_*.png', 'bosses/*.png']
+        }],
         'status': 'stopped',
         'app': None,
+        'server': None,
+        'process': None,
         'thread': None
     },
     'connect-four': {
@@ -78,16 +132,135 @@ GAMES = {
         'main_file': 'connect_four.html',
         'status': 'stopped',
         'app': None,
+        'server': None,
+        'process': None,
         'thread': None
     }
 }
 
+class GameServer:
+    """One game's own HTTP server (ports mode) that can really be shut down
+
+    Counts in-flight requests so stop() can let them finish before the
+    listening socket is closed.
+    """
+    
+    def __init__(self, game_app, port):
+        self.game_app = game_app
+        self.active = 0
+        self.closing = False
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        # Binds here, so a taken port fails now rather than in the thread
+        self.server = make_server('0.0.0.0', port, self.handle, threaded=True)
+        self.thread = threading.Thread(target=self.server.serve_forever, kwargs={'poll_interval': 0.1},
+                                       daemon=True)
+    
+    def start(self):
+        self.thread.start()
+    
+    def handle(self, environ, start_response):
+        if self.closing:
+            # A keep-alive connection outlived the server; tell the client to go
+            response = Response("Game is shutting down", status=503, mimetype='text/plain',
+                                headers={'Connection': 'close'})
+            return response(environ, start_response)
+        with self._lock:
+            self.active += 1
+        try:
+            return ClosingIterator(self.game_app(environ, start_response), self._finished)
+        except Exception:
+            self._finished()
+            raise
+    
+    def _finished(self):
+        with self._lock:
+            self.active -= 1
+            if not self.active:
+                self._idle.notify_all()
+    
+    def stop(self, drain_timeout=DRAIN_TIMEOUT):
+        """Stop accepting, wait for in-flight requests, then release the port"""
+        self.server.shutdown()
+        self.closing = True
+        with self._lock:
+            drained = self._idle.wait_for(lambda: not self.active, timeout=drain_timeout)
+        self.server.server_close()
+        self.thread.join(timeout=1)
+        return drained
+
+class GameProcess:
+    """One game running in its own child process (processes mode)"""
+    
+    def __init__(self, command, cwd, cpus=None, env=None):
+        self.command = command
+        self.cwd = cwd
+        self.cpus = cpus
+        self.env = env
+        self.process = None
+        self.started_at = None
+        self.exit_code = None
+        self.restarts = 0
+        self.backoff = RESTART_BACKOFF
+        self.restart_at = None   # monotonic time of the next restart after a crash
+    
+    @property
+    def pid(self):
+        return self.process.pid if self.process else None
+    
+    def spawn(self):
+        preexec = None
+        if self.cpus and hasattr(os, 'sched_setaffinity'):
+            cpus = set(self.cpus) & os.sched_getaffinity(0)
+            if cpus != set(self.cpus):
+                print(f"⚠️ CPUs {sorted(set(self.cpus) - cpus)} are not available; pinning to {sorted(cpus)}")
+            if cpus:
+                # Set in the child before it runs the game, so every thread it starts inherits the mask
+                preexec = lambda: os.sched_setaffinity(0, cpus)
+        self.process = subprocess.Popen(self.command, cwd=self.cwd, env=self.env, preexec_fn=preexec)
+        self.started_at = time.monotonic()
+        self.exit_code = None
+    
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+    
+    def stop(self, drain_timeout=DRAIN_TIMEOUT):
+        """SIGTERM (the child drains), then SIGKILL if it takes too long"""
+        if not self.alive():
+            return True
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=drain_timeout + 1)
+            return True
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+            return False
+
 class GameLauncher:
     def __init__(self):
         # We're in Games/Game_launcher/, need to go up one level to Games/
         current_dir = os.path.dirname(os.path.abspath(__file__))  # Games/Game_launcher/
         self.base_dir = os.path.dirname(current_dir)  # Games/
+        # One start/stop cycle at a time, so API calls can't interleave
+        # (reentrant: Ctrl+C during startup stops from inside start_all_servers)
+        self._lock = threading.RLock()
+        # Guards game['process'] between start/stop and the supervisor
+        self._process_lock = threading.Lock()
+        self._supervisor = None
+        # Built once and kept across stop/start: the manifest keeps itself up to
+        # date from file mtimes, so a restart doesn't recompress every asset
+        self._apps = {}
         
+    def game_app(self, game_key):
+        """The game's Flask app, created on first use (None if the game can't be served)"""
+        game_app = self._apps.get(game_key)
+        if game_app is None:
+            game_app = self.create_game_app(game_key)
+            if game_app is not None:
+                self._apps[game_key] = game_app
+        return game_app
+    
     def create_game_app(self, game_key):
         """Create a Flask app for a specific game"""
         game = GAMES[game_key]
@@ -100,112 +273,282 @@ class GameLauncher:
             print(f"❌ Directory not found: {game_dir}")
             return None
         
+        # Sprite atlases first, so the manifest picks up fresh pages
+        for atlas in game.get('atlases', []):
+            ensure_atlas(game_dir, atlas)
+        
         # Create Flask app for this game
         game_app = Flask(f"game_{game_key}")
+        # Every URL the game serves, mapped once; small files held in memory
+        assets = AssetManifest(game_dir, game['main_file'])
+        game_app.extensions['assets'] = assets
         
         @game_app.route('/')
         def index():
             """Serve the main game page"""
-            try:
-                main_file_path = os.path.join(game_dir, game['main_file'])
-                with open(main_file_path, 'r', encoding='utf-8') as f:
-                    return f.read()
-            except FileNotFoundError:
+            response = assets.serve('', request)
+            if response is None:
                 return f"Game file not found: {game['main_file']}", 404
+            return response
         
         @game_app.route('/<path:filename>')
         def serve_static(filename):
-            """Serve static files"""
-            try:
-                return send_from_directory(game_dir, filename)
-            except:
-                # Try common subdirectories
-                for subdir in ['static', 'css', 'js', 'images', 'img', 'audio', 'sounds']:
-                    try:
-                        subdir_path = os.path.join(game_dir, subdir)
-                        if os.path.exists(subdir_path):
-                            return send_from_directory(subdir_path, filename)
-                    except:
-                        continue
+            """Serve static files (also found under static/, css/, js/, images/, ...)"""
+            response = assets.serve(filename, request)
+            if response is None:
                 return f"File not found: {filename}", 404
+            return response
         
         @game_app.route('/health')
         def health():
             """Health check endpoint"""
             return {"status": "healthy", "game": game['name'], "port": game['port']}
         
+        @game_app.route('/_arcade/dependencies')
+        def dependencies():
+            """The game's page dependency graph (read by the launcher API in processes mode)"""
+            return assets.dependency_graph()
+        
         return game_app
     
+    def game_url(self, game_key):
+        """Where the game is served in the current mode (None: on its own port)"""
+        if LAUNCHER_MODE == 'single' and not GAMES[game_key].get('server_script'):
+            return f"/games/{game_key}/"
+        return None
+    
     def start_game_server(self, game_key):
-        """Start a specific game server"""
+        """Start a specific game server; it counts as running once /health answers"""
         game = GAMES[game_key]
         
         if game['status'] == 'running':
             print(f"⚠️ {game['name']} is already running")
             return True
         
-        # Create Flask app for this game
-        game_app = self.create_game_app(game_key)
+        if LAUNCHER_MODE == 'processes' or game.get('server_script'):
+            # A game with its own server keeps its port even in single mode
+            return self.start_game_process(game_key)
+        
+        # The game's app, from an earlier start if there was one
+        game_app = self.game_app(game_key)
         if not game_app:
             game['status'] = 'failed'
             return False
         
-        game['app'] = game_app
         game['status'] = 'starting'
         
-        def run_game_server():
-            try:
-                print(f"🚀 Starting {game['name']} on port {game['port']}...")
-                game_app.run(
-                    host='0.0.0.0',
-                    port=game['port'],
-                    debug=False,
-                    use_reloader=False,
-                    threaded=True
-                )
-            except Exception as e:
-                print(f"❌ Error running {game['name']}: {e}")
+        if LAUNCHER_MODE == 'single':
+            # Nothing to bind: check the app itself, then let the shared server dispatch to it
+            if not self.probe_app(game_app):
+                print(f"❌ {game['name']} failed its health check")
                 game['status'] = 'failed'
+                return False
+            game['app'] = game_app
+            game['status'] = 'running'
+            print(f"✅ {game['name']} ready at {self.game_url(game_key)}")
+            return True
+        
+        print(f"🚀 Starting {game['name']} on port {game['port']}...")
+        try:
+            server = GameServer(game_app, game['port'])
+        except (OSError, SystemExit) as e:
+            # Werkzeug reports a bind failure (usually a taken port) by exiting, not raising
+            reason = e if isinstance(e, OSError) else 'port already in use?'
+            print(f"❌ {game['name']} could not bind port {game['port']}: {reason}")
+            game['status'] = 'failed'
+            return False
+        server.start()
         
-        # Start the game server in a separate thread
-        thread = threading.Thread(target=run_game_server, daemon=True)
-        thread.start()
-        game['thread'] = thread
+        if not self.probe_port(game['port']):
+            print(f"❌ {game['name']} did not answer /health within {READY_TIMEOUT:.0f}s")
+            server.stop(drain_timeout=0)
+            game['status'] = 'failed'
+            return False
         
-        # Wait a moment and check if it started
-        time.sleep(1)
+        game['app'] = game_app
+        game['server'] = server
+        game['thread'] = server.thread
         game['status'] = 'running'
         print(f"✅ {game['name']} started successfully on port {game['port']}!")
         return True
     
+    def start_game_process(self, game_key):
+        """Start a game as a supervised child process (processes mode)"""
+        game = GAMES[game_key]
+        game_dir = os.path.join(self.base_dir, game['directory'])
+        options = PROCESS_CONFIG.get(game_key, {})
+        env = None
+        
+        if game.get('server_script'):
+            # Its own server sizes itself from its own settings (JOKE_* for the joke generator)
+            if 'workers' in options:
+                print(f"⚠️ {game['name']} runs its own server; its 'workers' setting is ignored")
+            command = [sys.executable, game['server_script']]
+        else:
+            workers = options.get('workers', PROCESS_WORKERS)
+            command = [sys.executable, os.path.abspath(__file__), '--serve-game', game_key,
+                       '--workers', str(workers)]
+            # Its share of the image encoders, set in main()
+            env = dict(os.environ, ARCADE_IMAGE_WORKERS=str(images.workers))
+        child = GameProcess(command, game_dir, cpus=options.get('cpus'), env=env)
+        
+        game['status'] = 'starting'
+        print(f"🚀 Starting {game['name']} as a process on port {game['port']}...")
+        try:
+            child.spawn()
+        except OSError as e:
+            print(f"❌ Could not start {game['name']}: {e}")
+            game['status'] = 'failed'
+            return False
+        
+        if not self.probe_port(game['port'], path=game.get('health_path', '/health'), process=child):
+            print(f"❌ {game['name']} did not answer /health within {READY_TIMEOUT:.0f}s")
+            child.stop(drain_timeout=0)
+            game['status'] = 'failed'
+            return False
+        
+        with self._process_lock:
+            game['process'] = child
+            game['status'] = 'running'
+        print(f"✅ {game['name']} started successfully as pid {child.pid} on port {game['port']}!")
+        
+        if self._supervisor is None:
+            self._supervisor = threading.Thread(target=self.supervise, daemon=True)
+            self._supervisor.start()
+        return True
+    
+    def supervise(self):
+        """Notice crashed game processes and restart them with exponential backoff"""
+        while True:
+            time.sleep(0.2)
+            now = time.monotonic()
+            restarted = []
+            with self._process_lock:
+                for game_key, game in GAMES.items():
+                    child = game['process']
+                    if child is None:
+                        continue
+                    if child.alive():
+                        if child.restart_at is None and now - child.started_at > STABLE_AFTER:
+                            child.backoff = RESTART_BACKOFF
+                        continue
+                    if child.restart_at is None:
+                        child.exit_code = child.process.returncode
+                        child.restart_at = now + child.backoff
+                        game['status'] = 'crashed'
+                        print(f"💥 {game['name']} exited with code {child.exit_code}; "
+                              f"restarting in {child.backoff:.1f}s")
+                        child.backoff = min(child.backoff * 2, RESTART_BACKOFF_MAX)
+                    elif now >= child.restart_at:
+                        child.restart_at = None
+                        child.restarts += 1
+                        try:
+                            child.spawn()
+                        except OSError as e:
+                            print(f"❌ Could not restart {game['name']}: {e}")
+                            child.restart_at = now + child.backoff
+                            continue
+                        game['status'] = 'starting'
+                        restarted.append((game_key, child))
+            for game_key, child in restarted:
+                threading.Thread(target=self.await_ready, args=(game_key, child), daemon=True).start()
+    
+    def await_ready(self, game_key, child):
+        """Mark a restarted process running once it answers its health check"""
+        game = GAMES[game_key]
+        ready = self.probe_port(game['port'], path=game.get('health_path', '/health'), process=child)
+        with self._process_lock:
+            if game['process'] is child and ready:
+                game['status'] = 'running'
+                print(f"✅ {game['name']} is back as pid {child.pid} (restart #{child.restarts})")
+    
+    def probe_app(self, game_app):
+        """In-process /health request against a game's app"""
+        try:
+            return game_app.test_client().get('/health').status_code == 200
+        except Exception:
+            return False
+    
+    def probe_port(self, port, timeout=READY_TIMEOUT, path='/health', process=None):
+        """Poll http://127.0.0.1:<port><path> until it answers 200 or time runs out
+
+        With a process, gives up as soon as that process exits.
+        """
+        deadline = time.monotonic() + timeout
+        delay = 0.01
+        while True:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=1) as response:
+                    if response.status == 200:
+                        # Something answered; make sure it wasn't an older server on the same port
+                        return process is None or process.alive()
+            except OSError:
+                pass
+            if process is not None and not process.alive():
+                return False
+            if time.monotonic() + delay > deadline:
+                return False
+            time.sleep(delay)
+            delay = min(delay * 2, 0.25)
+    
     def stop_game_server(self, game_key):
-        """Stop a specific game server"""
+        """Stop a specific game server, letting in-flight requests finish"""
         game = GAMES[game_key]
-        game['status'] = 'stopped'
+        server = game['server']
+        with self._process_lock:
+            # Taken from the supervisor first, so the exit isn't mistaken for a crash
+            child = game['process']
+            game['process'] = None
+            game['status'] = 'stopping'
+        # Single mode: the shared server answers 503 as soon as the app is gone
         game['app'] = None
+        if server is not None and not server.stop():
+            print(f"⚠️ {game['name']} still had requests running after {DRAIN_TIMEOUT:.0f}s")
+        if child is not None and not child.stop():
+            print(f"⚠️ {game['name']} did not exit within {DRAIN_TIMEOUT:.0f}s and was killed")
+        game['server'] = None
         game['thread'] = None
-        print(f"🛑 {game['name']} marked as stopped")
+        game['status'] = 'stopped'
+        print(f"🛑 {game['name']} stopped")
         return True
     
     def start_all_servers(self):
-        """Start all game servers"""
+        """Start all game servers at once; returns how many came up"""
         print("🚀 Starting all game servers...")
         
-        for game_key in GAMES:
-            self.start_game_server(game_key)
-            time.sleep(0.5)  # Small delay between starts
+        with self._lock, ThreadPoolExecutor(max_workers=len(GAMES)) as executor:
+            started = sum(executor.map(self.start_game_server, GAMES))
         
-        print("✅ All servers started!")
+        if started == len(GAMES):
+            print("✅ All servers started!")
+        else:
+            print(f"⚠️ {started} of {len(GAMES)} servers started")
+        return started
     
     def stop_all_servers(self):
-        """Stop all game servers"""
+        """Stop all game servers at once"""
         print("🛑 Stopping all game servers...")
         
-        for game_key in GAMES:
-            self.stop_game_server(game_key)
+        with self._lock, ThreadPoolExecutor(max_workers=len(GAMES)) as executor:
+            list(executor.map(self.stop_game_server, GAMES))
         
         print("✅ All servers stopped!")
     
+    def get_dependencies(self, game_key):
+        """A game's page dependency graph, or None while it isn't serving one"""
+        game = GAMES[game_key]
+        if game['app'] is not None:
+            return game['app'].extensions['assets'].dependency_graph()
+        if game['status'] != 'running':
+            return None
+        # Processes mode: the graph lives in the game's own process
+        try:
+            with urllib.request.urlopen(f"http://localhost:{game['port']}/_arcade/dependencies",
+                                        timeout=READY_TIMEOUT) as response:
+                return json.load(response)
+        except (OSError, ValueError):
+            return None
+    
     def get_server_status(self):
         """Get status of all servers"""
         status = {}
@@ -213,66 +556,227 @@ class GameLauncher:
             status[game_key] = {
                 'name': game['name'],
                 'port': game['port'],
+                'url': self.game_url(game_key),
                 'status': game['status']
             }
+            child = game['process']
+            if child is not None:
+                status[game_key].update(pid=child.pid, restarts=child.restarts, exit_code=child.exit_code)
         
         return status
 
-# Initialize the game launcher
-launcher = GameLauncher()
+class GameDispatcher:
+    """WSGI app that hands each request to a game's app or to the game selector
+
+    Games are picked by Host header (snake-game.localhost:8000), by path
+    prefix (/games/snake-game/...), or by the game's old port when the
+    server also listens there. A game with its own server (the joke
+    generator) runs on its own port; its requests are redirected there.
+    """
+
+    def __init__(self, master_app, games):
+        self.master_app = master_app
+        self.games = games
+        self.ports = {str(game['port']): game_key for game_key, game in games.items()}
+
+    def __call__(self, environ, start_response):
+        game_key, prefix = self.route(environ)
+        if game_key is None:
+            return self.master_app(environ, start_response)
+
+        game = self.games[game_key]
+        if game.get('server_script'):
+            host = environ.get('HTTP_HOST', 'localhost').split(':')[0]
+            rest = environ.get('PATH_INFO', '')[len(prefix or ''):] or '/'
+            location = f"{environ.get('wsgi.url_scheme', 'http')}://{host}:{game['port']}{quote(rest)}"
+            if environ.get('QUERY_STRING'):
+                location += '?' + environ['QUERY_STRING']
+            return redirect(location, 302)(environ, start_response)
+
+        if prefix:
+            rest = environ.get('PATH_INFO', '')[len(prefix):]
+            if not rest:
+                # Games link their assets relatively, so the page URL needs its trailing slash
+                location = environ.get('SCRIPT_NAME', '') + prefix + '/'
+                if environ.get('QUERY_STRING'):
+                    location += '?' + environ['QUERY_STRING']
+                return redirect(location, 301)(environ, start_response)
+            environ['SCRIPT_NAME'] = environ.get('SCRIPT_NAME', '') + prefix
+            environ['PATH_INFO'] = rest
+
+        game_app = game['app']
+        if game_app is None:
+            response = Response(f"{game['name']} is not running", status=503, mimetype='text/plain')
+            return response(environ, start_response)
+        return game_app(environ, start_response)
+
+    def route(self, environ):
+        """(game key, path prefix to strip) for a request, or (None, None) for the selector"""
+        host = environ.get('HTTP_HOST', '').split(':')[0]
+        if '.' in host:
+            label = host.split('.', 1)[0]
+            if label in self.games:
+                return label, None
+
+        parts = environ.get('PATH_INFO', '').split('/', 3)   # '', 'games', key, rest
+        if len(parts) >= 3 and parts[1] == 'games' and parts[2] in self.games:
+            return parts[2], f"/games/{parts[2]}"
+
+        game_key = self.ports.get(environ.get('SERVER_PORT'))
+        if game_key is not None:
+            return game_key, None
+        return None, None
+
+def serve_single(dispatcher):
+    """Serve the selector and every game from one server and one thread pool"""
+    listen = [f"0.0.0.0:{MASTER_PORT}"]
+    if LEGACY_PORTS:
+        # Not the ports of games that run their own server there
+        listen += [f"0.0.0.0:{game['port']}" for game in GAMES.values() if not game.get('server_script')]
+    
+    try:
+        from waitress import serve
+    except ImportError:
+        print("⚠️ waitress is not installed (pip install waitress); using the Flask dev server instead")
+        if LEGACY_PORTS:
+            print("⚠️ Old per-game ports need waitress; games are only under /games/<game>/")
+        from werkzeug.serving import run_simple
+        run_simple('0.0.0.0', MASTER_PORT, dispatcher, threaded=True)
+        return
+    
+    print(f"🌐 Serving {len(listen)} socket(s) with {WORKER_THREADS} worker threads")
+    serve(dispatcher, listen=' '.join(listen), threads=WORKER_THREADS, ident='Game Arcade')
+
+def serve_game_process(game_key, workers):
+    """Child side of processes mode: serve one game on its own port until SIGTERM"""
+    game = GAMES[game_key]
+    game_app = launcher.create_game_app(game_key)
+    if game_app is None:
+        sys.exit(1)
+    
+    try:
+        from waitress import create_server
+    except ImportError:
+        # Without waitress: a GameServer (one thread per request), drained on SIGTERM
+        server = GameServer(game_app, game['port'])
+        stopping = threading.Event()
+        signal.signal(signal.SIGTERM, lambda sig, frame: stopping.set())
+        server.start()
+        stopping.wait()
+        server.stop()
+        images.shutdown()
+        return
+    
+    server = create_server(game_app, host='0.0.0.0', port=game['port'], threads=workers, ident=game['name'])
+    
+    def drain():
+        # Stop accepting, let the workers finish their requests, then let the
+        # event loop flush what they wrote before exiting
+        images.shutdown()
+        server.accepting = False
+        server.task_dispatcher.shutdown(cancel_pending=False, timeout=DRAIN_TIMEOUT)
+        deadline = time.monotonic() + 1
+        while time.monotonic() < deadline and any(
+                getattr(channel, 'total_outbufs_len', 0) for channel in list(server._map.values())):
+            time.sleep(0.05)
+        os._exit(0)
+    
+    signal.signal(signal.SIGTERM, lambda sig, frame: threading.Thread(target=drain, daemon=True).start())
+    print(f"🚀 {game['name']} serving on port {game['port']} with {workers} worker threads (pid {os.getpid()})")
+    server.run()
+
+# Set up in main(): the image encoder processes are spawned, and each one
+# imports this module (as __mp_main__) without needing either
+launcher = None
+selector_assets = None
 
 # Flask routes for the master server (game selector)
 @app.route('/')
 def index():
     """Serve the game selector page"""
-    try:
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        selector_path = os.path.join(current_dir, 'game-selector.html')
-        with open(selector_path, 'r', encoding='utf-8') as f:
-            return f.read()
-    except FileNotFoundError:
+    response = selector_assets.serve('', request)
+    if response is None:
         return "Game selector not found. Please ensure game-selector.html exists.", 404
+    return response
 
 @app.route('/api/servers/start', methods=['POST'])
 def start_servers():
-    """API endpoint to start all servers"""
-    launcher.start_all_servers()
-    return jsonify({"status": "success", "message": "Starting all servers"})
+    """API endpoint to start all servers (returns once they are up)"""
+    started = launcher.start_all_servers()
+    return jsonify({
+        "status": "success" if started == len(GAMES) else "partial",
+        "message": f"Started {started} of {len(GAMES)} servers",
+        "servers": launcher.get_server_status()
+    })
 
 @app.route('/api/servers/stop', methods=['POST'])
 def stop_servers():
-    """API endpoint to stop all servers"""
+    """API endpoint to stop all servers (returns once they are down)"""
     launcher.stop_all_servers()
-    return jsonify({"status": "success", "message": "Stopping all servers"})
+    return jsonify({"status": "success", "message": "Stopped all servers"})
 
 @app.route('/api/servers/status')
 def server_status():
     """API endpoint to get server status"""
     return jsonify(launcher.get_server_status())
 
+@app.route('/api/games/<game_key>/dependencies')
+def game_dependencies(game_key):
+    """API endpoint to see what each game page loads and which files it preloads"""
+    if game_key not in GAMES:
+        return jsonify({"status": "error", "message": f"Unknown game: {game_key}"}), 404
+    graph = launcher.get_dependencies(game_key)
+    if graph is None and GAMES[game_key]['status'] != 'running':
+        return jsonify({"status": "error", "message": f"{GAMES[game_key]['name']} is not running"}), 503
+    if graph is None:
+        # A game with its own server script has no asset manifest to ask
+        return jsonify({"status": "error", "message": f"No dependency graph for {GAMES[game_key]['name']}"}), 404
+    return jsonify({"game": game_key, **graph})
+
 @app.route('/health')
 def health():
     """Health check for the master server"""
-    return {"status": "healthy", "service": "Game Launcher", "port": 8000}
+    return {"status": "healthy", "service": "Game Launcher", "port": MASTER_PORT, "mode": LAUNCHER_MODE}
 
 def signal_handler(sig, frame):
     """Handle Ctrl+C gracefully"""
     print("\n� Sehutting down Game Launcher...")
     launcher.stop_all_servers()
+    images.shutdown()
     print("👋 Game Launcher stopped. Thanks for playing!")
     sys.exit(0)
 
-if __name__ == '__main__':
-    # Register signal handler for graceful shutdown
+def main():
+    global launcher, selector_assets
+    launcher = GameLauncher()
+    
+    if '--serve-game' in sys.argv:
+        # A child started by processes mode
+        serve_game_process(sys.argv[sys.argv.index('--serve-game') + 1],
+                           int(sys.argv[sys.argv.index('--workers') + 1]) if '--workers' in sys.argv
+                           else PROCESS_WORKERS)
+        sys.exit(0)
+    
+    if LAUNCHER_MODE == 'processes':
+        # The launcher and every --serve-game child each run an encoder pool: split the CPUs between them
+        encoders = 1 + sum(1 for game in GAMES.values() if not game.get('server_script'))
+        images.workers = max(1, images.workers // encoders)
+    selector_assets = AssetManifest(os.path.dirname(os.path.abspath(__file__)), 'game-selector.html')
+    
+    # Register signal handler for graceful shutdown (SIGTERM too, so child processes aren't orphaned)
     signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
     
     print("�  Game Launcher - Master Server")
     print("=" * 50)
-    print("🌐 Game Selector: http://localhost:8000")
+    print(f"🌐 Game Selector: http://localhost:{MASTER_PORT}")
     print("🎯 Available Games:")
     
     for game_key, game in GAMES.items():
-        print(f"   • {game['name']}: http://localhost:{game['port']}")
+        if launcher.game_url(game_key):
+            print(f"   • {game['name']}: http://localhost:{MASTER_PORT}{launcher.game_url(game_key)}")
+        else:
+            print(f"   • {game['name']}: http://localhost:{game['port']}")
     
     print("\n🚀 Starting master server and all games...")
     print("💡 Use Ctrl+C to stop all servers")
@@ -282,15 +786,22 @@ if __name__ == '__main__':
         # Start all game servers first
         launcher.start_all_servers()
         
-        # Then start the master server (game selector)
-        print(f"🌐 Starting Game Selector on port 8000...")
-        app.run(
-            host='0.0.0.0',
-            port=8000,
-            debug=False,
-            use_reloader=False,
-            threaded=True
-        )
+        if LAUNCHER_MODE == 'single':
+            # One server for the selector and every game
+            serve_single(GameDispatcher(app, GAMES))
+        else:
+            # Then start the master server (game selector)
+            print(f"🌐 Starting Game Selector on port {MASTER_PORT}...")
+            app.run(
+                host='0.0.0.0',
+                port=MASTER_PORT,
+                debug=False,
+                use_reloader=False,
+                threaded=True
+            )
     except Exception as e:
         print(f"❌ Error starting master server: {e}")
-        launcher.stop_all_servers()
\ No newline at end of file
+        launcher.stop_all_servers()
+
+if __name__ == '__main__':
+    main()
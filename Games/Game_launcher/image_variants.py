@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Image variants for the Game Launcher
+Makes AVIF and WebP copies of the games' PNG and JPEG images, plus smaller
+copies at a few fixed widths, and keeps them in a cache directory named by
+the source's content hash. An edited image gets a new hash, so only it is
+re-encoded; everything else is found on disk and reused, across restarts.
+Encoding runs in a process pool, never on the request path: until a variant
+is ready the original is served. Each request gets the smallest variant its
+Accept header allows, at the width it asked for (?w= or Sec-CH-Width).
+
+Build the cache ahead of time (e.g. before starting processes mode):
+    python image_variants.py [--prune] [directory ...]
+"""
+
+import os
+import io
+import sys
+import hashlib
+import mimetypes
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait
+
+try:
+    from PIL import Image, features
+except ImportError:
+    # Optional: without Pillow the originals are served as they are
+    Image = None
+
+ENABLED = os.environ.get('ARCADE_IMAGE_VARIANTS', '1') == '1'
+CACHE_DIR = os.environ.get('ARCADE_IMAGE_CACHE') or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '.image-cache')
+WIDTHS = sorted(int(width) for width in os.environ.get('ARCADE_IMAGE_WIDTHS', '256,512').split(',') if width.strip())
+WORKERS = int(os.environ.get('ARCADE_IMAGE_WORKERS', 0)) or os.cpu_count() or 1
+
+SOURCE_FORMATS = {'image/png': 'png', 'image/jpeg': 'jpeg'}
+# variant format -> (mimetype, Pillow format, encoder options)
+FORMATS = {
+    'avif': ('image/avif', 'AVIF', {'quality': 60, 'speed': 6}),
+    'webp': ('image/webp', 'WEBP', {'quality': 82, 'method': 4}),
+    'png': ('image/png', 'PNG', {'optimize': True}),
+    'jpeg': ('image/jpeg', 'JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+MODERN_FORMATS = ('avif', 'webp')
+for _fmt in MODERN_FORMATS:
+    # Older Pythons don't know these, and variant files are served by extension
+    mimetypes.add_type(FORMATS[_fmt][0], '.' + _fmt)
+# Request headers that pick the variant, for Vary
+VARY = ('Accept', 'Sec-CH-Width')
+
+
+def make_variant(source, digest, target, fmt, width):
+    """Encode one variant in a pool process; returns its size, or None if the source changed"""
+    if os.path.exists(target):
+        # Another launcher process got there first
+        return os.path.getsize(target)
+    with open(source, 'rb') as handle:
+        data = handle.read()
+    if hashlib.blake2b(data, digest_size=16).hexdigest() != digest:
+        # Edited since it was queued; the manifest will queue the new content under its own hash
+        return None
+    with Image.open(io.BytesIO(data)) as image:
+        image.load()
+        if width is not None:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.LANCZOS)
+        if fmt == 'jpeg' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        _, pil_format, options = FORMATS[fmt]
+        temp = f"{target}.{os.getpid()}.tmp"
+        image.save(temp, pil_format, **options)
+    # Atomic, so a half-written file is never served or mistaken for a finished one
+    os.replace(temp, target)
+    return os.path.getsize(target)
+
+
+def requested_width(request):
+    """The width in pixels a request asks for, or None for full size"""
+    width = request.args.get('w', type=int) or request.headers.get('Sec-CH-Width', type=int)
+    return width if width and width > 0 else None
+
+
+def accepted_formats(request):
+    """Variant formats the browser names in Accept (a bare */* doesn't count)"""
+    offered = {value for value, quality in request.accept_mimetypes if quality > 0}
+    return {fmt for fmt in MODERN_FORMATS if FORMATS[fmt][0] in offered}
+
+
+class SourceImage:
+    """One source image (by content hash) and the variants of it that are ready"""
+
+    def __init__(self, digest, size, fmt, widths):
+        self.digest = digest
+        self.size = size
+        self.format = fmt
+        self.widths = widths     # resized widths built for it (only ones narrower than the source)
+        self.ready = {}          # (format, width or None) -> (path, size)
+
+
+class ImageVariants:
+    """Variant cache on disk, filled by a process pool, and per-request selection"""
+
+    def __init__(self, cache_dir=CACHE_DIR, widths=WIDTHS, workers=WORKERS, enabled=ENABLED):
+        self.cache_dir = cache_dir
+        self.widths = widths
+        self.workers = workers
+        self.enabled = enabled and Image is not None
+        self.formats = [fmt for fmt in MODERN_FORMATS if self.enabled and features.check(fmt)]
+        self._images = {}     # source digest -> SourceImage
+        self._pending = {}    # target path -> Future
+        self._pool = None
+        # Reentrant: a future that is already done runs its callback inside add()
+        self._lock = threading.RLock()
+
+    def handles(self, mimetype):
+        return self.enabled and mimetype in SOURCE_FORMATS
+
+    def add(self, path, digest, mimetype):
+        """Queue whatever variants of an image aren't cached yet (a no-op for a known hash)"""
+        if not self.handles(mimetype):
+            return
+        with self._lock:
+            if digest in self._images:
+                return
+            self._images[digest] = None  # claimed; filled in below
+        try:
+            with Image.open(path) as image:
+                source_width = image.width
+            size = os.path.getsize(path)
+            os.makedirs(self.cache_dir, exist_ok=True)
+        except (OSError, Image.DecompressionBombError) as e:
+            print(f"⚠️  No image variants for {path}: {e}")
+            with self._lock:
+                # Release the claim, or choose() would never find it and it would never be retried
+                self._images.pop(digest, None)
+            return
+        original = SOURCE_FORMATS[mimetype]
+        source = SourceImage(digest, size, original,
+                             [width for width in self.widths if width < source_width])
+        jobs = [(fmt, None) for fmt in self.formats]
+        for width in source.widths:
+            jobs += [(fmt, width) for fmt in self.formats + [original]]
+
+        with self._lock:
+            self._images[digest] = source
+            for fmt, width in jobs:
+                target = os.path.join(self.cache_dir, f"{digest}-{width or 'full'}.{fmt}")
+                if os.path.exists(target):
+                    source.ready[fmt, width] = (target, os.path.getsize(target))
+                    continue
+                if target in self._pending:
+                    continue
+                future = self._executor().submit(make_variant, path, digest, target, fmt, width)
+                self._pending[target] = future
+                future.add_done_callback(
+                    lambda future, fmt=fmt, width=width, target=target: self._finished(
+                        source, fmt, width, target, future))
+
+    def choose(self, digest, request):
+        """Path of the best ready variant for this request, or None to send the original"""
+        source = self._images.get(digest)
+        if source is None:
+            return None
+        width = requested_width(request)
+        fits = [candidate for candidate in source.widths if width is not None and candidate >= width]
+        target = min(fits) if fits else None
+        formats = accepted_formats(request) | {source.format}
+        # Full size: a variant has to beat the original to be worth sending
+        best, best_size = None, source.size if target is None else float('inf')
+        for (fmt, variant_width), (path, size) in list(source.ready.items()):
+            if variant_width == target and fmt in formats and size < best_size:
+                best, best_size = path, size
+        return best
+
+    def wait(self):
+        """Block until every queued variant is built"""
+        wait(list(self._pending.values()))
+
+    def shutdown(self):
+        """Drop queued work and let the pool exit (encodes already running finish)"""
+        with self._lock:
+            self.enabled = False
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def prune(self):
+        """Delete cached variants of images not added to this instance; returns how many
+
+        Only safe after adding every image the cache serves: anything else counts as gone.
+        """
+        removed = 0
+        for name in os.listdir(self.cache_dir):
+            if name.split('-', 1)[0] not in self._images:
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
+
+    def _executor(self):
+        # Caller holds the lock. Spawned, not forked: the launcher is multithreaded
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                             mp_context=multiprocessing.get_context('spawn'))
+        return self._pool
+
+    def _finished(self, source, fmt, width, target, future):
+        with self._lock:
+            self._pending.pop(target, None)
+        if future.cancelled():
+            return
+        try:
+            size = future.result()
+        except Exception as e:
+            print(f"⚠️  Image variant {os.path.basename(target)} failed: {e}")
+            return
+        if size is not None:
+            source.ready[fmt, width] = (target, size)
+
+
+def main(argv):
+    from static_assets import file_digest, self_fingerprinted, SKIP_DIRS
+
+    prune = '--prune' in argv
+    directories = [arg for arg in argv if arg != '--prune']
+    if prune and directories:
+        # The cache is shared by every game, so a partial scan would delete the others' variants
+        print("❌ --prune scans the whole Games/ tree; run it without directories")
+        return 2
+    directories = directories or [os.path.dirname(os.path.dirname(os.path.abspath(__file__)))]
+    if Image is None:
+        print("❌ Pillow is not installed (pip install Pillow)")
+        return 1
+
+    variants = ImageVariants(enabled=True)
+    print(f"🖼️  Building {', '.join(variants.formats) or 'no modern'} variants "
+          f"at widths {variants.widths} into {variants.cache_dir}")
+    for directory in directories:
+        for dirpath, dirnames, filenames in os.walk(directory):
+            dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS and not d.startswith('.')]
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                mimetype = {'.png': 'image/png', '.jpg': 'image/jpeg',
+                            '.jpeg': 'image/jpeg'}.get(os.path.splitext(filename)[1].lower())
+                if mimetype is None:
+                    continue
+                digest = file_digest(path)
+                # Atlas pages (named by their hash) are served as they are
+                if not self_fingerprinted(filename, digest):
+                    variants.add(path, digest, mimetype)
+    queued = len(variants._pending)
+    variants.wait()
+    print(f"✅ {len(variants._images)} images, {queued} variants built")
+    if prune:
+        print(f"🧹 Removed {variants.prune()} stale variants")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
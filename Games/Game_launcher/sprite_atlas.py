@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Sprite atlases for the Game Launcher
+Packs a game's sprite images into one or a few atlas pages (MaxRects, with
+transparent borders trimmed) plus a JSON frame map, so a game loads its
+characters with one request and one decode per page instead of one per
+sprite. Pages are named by their content hash (characters-0.3f2a9c1b0e.png),
+so the asset server caches them as immutable. The launcher rebuilds an atlas
+at startup when its source images changed; it can also be built by hand:
+    python sprite_atlas.py
+"""
+
+import os
+import io
+import sys
+import glob
+import json
+
+try:
+    from PIL import Image
+except ImportError:
+    # Optional: without Pillow games load their sprites one file at a time
+    Image = None
+
+from static_assets import content_digest, file_digest, fingerprinted
+
+MAX_PAGE_SIZE = 2048   # pixels; what low-end tablets handle comfortably as one texture
+PADDING = 2            # transparent pixels around each frame, so scaled draws don't bleed
+SETTINGS = {'max_page_size': MAX_PAGE_SIZE, 'padding': PADDING, 'trim': True}
+
+
+class MaxRects:
+    """One page's free space as maximal free rectangles (best short side fit)"""
+
+    def __init__(self, width, height):
+        self.free = [(0, 0, width, height)]
+        self.used_width = 0
+        self.used_height = 0
+
+    def insert(self, width, height):
+        """Top-left corner for a width x height box, or None when it doesn't fit"""
+        best = None
+        best_score = None
+        for free_x, free_y, free_width, free_height in self.free:
+            if width <= free_width and height <= free_height:
+                left_x, left_y = free_width - width, free_height - height
+                score = (min(left_x, left_y), max(left_x, left_y))
+                if best is None or score < best_score:
+                    best, best_score = (free_x, free_y), score
+        if best is None:
+            return None
+        self._place(best[0], best[1], width, height)
+        self.used_width = max(self.used_width, best[0] + width)
+        self.used_height = max(self.used_height, best[1] + height)
+        return best
+
+    def _place(self, x, y, width, height):
+        # Split every free rectangle the box overlaps into the parts left around it
+        free = set()
+        for rect in self.free:
+            free_x, free_y, free_width, free_height = rect
+            if (x >= free_x + free_width or x + width <= free_x
+                    or y >= free_y + free_height or y + height <= free_y):
+                free.add(rect)
+                continue
+            if x > free_x:
+                free.add((free_x, free_y, x - free_x, free_height))
+            if x + width < free_x + free_width:
+                free.add((x + width, free_y, free_x + free_width - x - width, free_height))
+            if y > free_y:
+                free.add((free_x, free_y, free_width, y - free_y))
+            if y + height < free_y + free_height:
+                free.add((free_x, y + height, free_width, free_y + free_height - y - height))
+        # Drop rectangles that lie inside another one
+        self.free = [rect for rect in free if not any(
+            other != rect and contains(other, rect) for other in free)]
+
+
+def contains(outer, inner):
+    return (inner[0] >= outer[0] and inner[1] >= outer[1]
+            and inner[0] + inner[2] <= outer[0] + outer[2]
+            and inner[1] + inner[3] <= outer[1] + outer[3])
+
+
+def atlas_sources(game_dir, spec):
+    """Frame name -> path for the images an atlas spec selects, in a stable order"""
+    root = os.path.join(game_dir, spec['root'])
+    sources = {}
+    for pattern in spec['include']:
+        for path in sorted(glob.glob(os.path.join(root, pattern))):
+            sources[os.path.relpath(path, root).replace(os.sep, '/')] = path
+    return sources
+
+
+def pack(sprites, max_size=MAX_PAGE_SIZE, padding=PADDING):
+    """Place (name, width, height) boxes on as few pages as it takes
+
+    Returns ([(page width, page height)], {name: (page, x, y)}).
+    """
+    pages = []
+    placed = {}
+    # Big and awkward first: that's what the free space has to be kept for
+    for name, width, height in sorted(sprites, key=lambda sprite: (-max(sprite[1:]), -sprite[1] * sprite[2])):
+        box_width, box_height = width + 2 * padding, height + 2 * padding
+        if box_width > max_size or box_height > max_size:
+            raise ValueError(f"{name} ({width}x{height}) is larger than an atlas page ({max_size}x{max_size})")
+        for index, page in enumerate(pages):
+            corner = page.insert(box_width, box_height)
+            if corner is not None:
+                break
+        else:
+            pages.append(MaxRects(max_size, max_size))
+            index, corner = len(pages) - 1, pages[-1].insert(box_width, box_height)
+        placed[name] = (index, corner[0] + padding, corner[1] + padding)
+    return [(page.used_width, page.used_height) for page in pages], placed
+
+
+def build_atlas(game_dir, spec):
+    """Pack the spec's images and write the pages and frame map; returns the map"""
+    sources = atlas_sources(game_dir, spec)
+    if not sources:
+        raise ValueError(f"No images match {spec['include']} under {spec['root']}")
+    output = os.path.join(game_dir, spec['output'])
+    out_dir, base = os.path.split(output)
+    os.makedirs(out_dir, exist_ok=True)
+
+    sprites = {}
+    for name, path in sources.items():
+        image = Image.open(path)
+        image.load()
+        image = image.convert('RGBA')
+        box = image.getchannel('A').getbbox() or (0, 0, 1, 1)
+        sprites[name] = (image, box)
+    sizes, placed = pack([(name, box[2] - box[0], box[3] - box[1]) for name, (image, box) in sprites.items()])
+
+    pages = [Image.new('RGBA', size, (0, 0, 0, 0)) for size in sizes]
+    frames = {}
+    for name, (image, box) in sprites.items():
+        index, x, y = placed[name]
+        pages[index].paste(image.crop(box), (x, y))
+        frames[name] = {
+            'page': index, 'x': x, 'y': y, 'w': box[2] - box[0], 'h': box[3] - box[1],
+            # Where the trimmed frame sat in the original image
+            'offsetX': box[0], 'offsetY': box[1], 'sourceW': image.width, 'sourceH': image.height,
+        }
+
+    page_names = []
+    for index, page in enumerate(pages):
+        buffer = io.BytesIO()
+        page.save(buffer, 'PNG', optimize=True)
+        data = buffer.getvalue()
+        name = fingerprinted(f"{base}-{index}.png", content_digest(data))
+        with open(os.path.join(out_dir, name + '.tmp'), 'wb') as handle:
+            handle.write(data)
+        os.replace(os.path.join(out_dir, name + '.tmp'), os.path.join(out_dir, name))
+        page_names.append(name)
+
+    atlas = {
+        'pages': page_names,
+        'frames': frames,
+        'sources': {name: file_digest(path) for name, path in sources.items()},
+        'settings': SETTINGS,
+    }
+    temp = output + '.json.tmp'
+    with open(temp, 'w', encoding='utf-8') as handle:
+        json.dump(atlas, handle, indent=1, sort_keys=True)
+    os.replace(temp, output + '.json')
+
+    # Pages of earlier builds are unreferenced now
+    for stale in glob.glob(os.path.join(out_dir, glob.escape(base) + '-*.png')):
+        if os.path.basename(stale) not in page_names:
+            os.remove(stale)
+    return atlas
+
+
+def atlas_current(game_dir, spec):
+    """True when the atlas on disk was built from exactly the current source images"""
+    output = os.path.join(game_dir, spec['output'])
+    try:
+        with open(output + '.json', encoding='utf-8') as handle:
+            atlas = json.load(handle)
+        out_dir = os.path.dirname(output)
+        if not all(os.path.exists(os.path.join(out_dir, page)) for page in atlas['pages']):
+            return False
+        sources = atlas_sources(game_dir, spec)
+        return atlas.get('settings') == SETTINGS and atlas['sources'] == {
+            name: file_digest(path) for name, path in sources.items()}
+    except (OSError, ValueError, KeyError):
+        return False
+
+
+def ensure_atlas(game_dir, spec):
+    """Rebuild the atlas if its sources changed; False when it can't be built"""
+    if atlas_current(game_dir, spec):
+        return True
+    if Image is None:
+        print(f"⚠️  Pillow not installed; {spec['output']} not built (sprites load one by one)")
+        return False
+    try:
+        atlas = build_atlas(game_dir, spec)
+    except (OSError, ValueError) as e:
+        print(f"❌ Atlas {spec['output']} failed: {e}")
+        return False
+    print(f"🧩 Packed {len(atlas['frames'])} sprites into {spec['output']} "
+          f"({len(atlas['pages'])} page{'s' if len(atlas['pages']) != 1 else ''})")
+    return True
+
+
+def main():
+    # The atlas specs live with the games in the launcher's GAMES table
+    import importlib.util
+    here = os.path.dirname(os.path.abspath(__file__))
+    loader = importlib.util.spec_from_file_location('game_launcher', os.path.join(here, 'game-launcher.py'))
+    launcher = importlib.util.module_from_spec(loader)
+    loader.loader.exec_module(launcher)
+
+    if Image is None:
+        print("❌ Pillow is not installed (pip install Pillow)")
+        return 1
+    ok = True
+    for game in launcher.GAMES.values():
+        for spec in game.get('atlases', []):
+            game_dir = os.path.join(os.path.dirname(here), game['directory'])
+            ok = ensure_atlas(game_dir, spec) and ok
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
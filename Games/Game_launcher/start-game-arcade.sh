@@ -36,6 +36,12 @@ if ! python3 -c "import requests" &> /dev/null; then
     fi
 fi
 
+# Check for waitress (optional: the single-server mode falls back to the Flask dev server)
+if ! python3 -c "import waitress" &> /dev/null; then
+    echo "📦 Waitress not found. Installing waitress..."
+    pip3 install waitress || echo "⚠️  Could not install waitress; using the Flask dev server"
+fi
+
 echo "✅ All dependencies satisfied!"
 echo ""
 
@@ -44,12 +50,15 @@ echo "🚀 Starting Game Arcade Master Server..."
 echo "🌐 Game Selector will be available at: http://localhost:8000"
 echo ""
 echo "🎯 Available Games:"
-echo "   • Tower Defense: http://localhost:8001"
-echo "   • Joke Generator: http://localhost:8002"
-echo "   • Memory Match: http://localhost:8003"
-echo "   • Tic-Tac-Toe: http://localhost:8004"
-echo "   • Snake Game: http://localhost:8005"
-echo "   • One Punch Man: http://localhost:8006"
+echo "   • Tower Defense: http://localhost:8000/games/tower-defense/"
+# The joke generator runs its own server (with the joke API) on its own port, even in single mode
+echo "   • Joke Generator: http://localhost:8002/"
+echo "   • Memory Match: http://localhost:8000/games/card-matching/"
+echo "   • Tic-Tac-Toe: http://localhost:8000/games/tic-tac-toe/"
+echo "   • Snake Game: http://localhost:8000/games/snake-game/"
+echo "   • One Punch Man: http://localhost:8000/games/one-punch-man/"
+echo "   • Connect Four: http://localhost:8000/games/connect-four/"
+echo "   (the old per-game ports, e.g. http://localhost:8001/, still work)"
 echo ""
 echo "💡 Press Ctrl+C to stop all servers"
 echo "=========================="
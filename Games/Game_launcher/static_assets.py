@@ -0,0 +1,679 @@
+#!/usr/bin/env python3
+"""
+Static assets for the Game Launcher
+Maps every URL a game can serve to its file once, at startup, so a request
+is a dict lookup instead of a cascade of os.path.exists calls. Small files
+are kept in memory; every file gets a strong ETag so browsers revalidate
+with a cheap 304. Text assets are gzip- and brotli-compressed once, when
+they are loaded, and the variant is picked per request by Accept-Encoding.
+Large files (music, big sprites) are memory-mapped and streamed, with Range
+support, through the server's wsgi.file_wrapper. Every asset also answers
+at a content-hashed URL (game.3f2a9c1b0e.js) cached as immutable, and pages
+are served with their asset links rewritten to those URLs. PNG and JPEG
+images are swapped for a smaller AVIF, WebP or resized copy when one is
+ready (image_variants.py). Each page is parsed for the scripts and styles
+it needs, which go out as Link: rel=preload headers (and 103 Early Hints
+where the server can send them). Changed files are picked up by a
+background re-check of mtimes at most once per check interval, so requests
+never wait on the disk.
+"""
+
+import os
+import io
+import re
+import gzip
+import mmap
+import time
+import posixpath
+import hashlib
+import mimetypes
+import threading
+from collections import OrderedDict
+from html.parser import HTMLParser
+from urllib.parse import quote
+from flask import Response
+from werkzeug.datastructures import ContentRange
+from werkzeug.http import is_resource_modified
+from werkzeug.wsgi import ClosingIterator
+from image_variants import ImageVariants, VARY as IMAGE_VARY
+
+try:
+    import brotli
+except ImportError:
+    # Optional: without it only gzip variants are built
+    brotli = None
+
+# Subdirectories whose files are also served from the game root (game.js for static/game.js),
+# tried in this order after the root itself
+SEARCH_DIRS = ['static', 'css', 'js', 'images', 'img', 'audio', 'sounds']
+
+# data/ holds server state (the joke store, its blocklist), never served
+SKIP_DIRS = {'__pycache__', 'node_modules', 'data'}
+# Live data (the joke store) changes all the time and is not an asset
+SKIP_SUFFIXES = ('.pyc', '.db', '.db-wal', '.db-shm', '.db-journal')
+
+MAX_CACHED_FILE = int(os.environ.get('ARCADE_CACHE_MAX_FILE', 256 * 1024))  # bytes; bigger files stream from disk
+ASSET_MAX_AGE = int(os.environ.get('ARCADE_ASSET_MAX_AGE', 300))             # seconds browsers may reuse an asset
+CHECK_INTERVAL = float(os.environ.get('ARCADE_ASSET_CHECK_INTERVAL', 2))     # seconds between mtime checks
+
+COMPRESSIBLE_TYPES = {'text/html', 'text/css', 'text/javascript', 'text/plain', 'text/xml',
+                      'application/javascript', 'application/json', 'application/xml', 'image/svg+xml'}
+MIN_COMPRESS = 1024       # bytes; smaller files aren't worth a variant
+ENCODINGS = ('br', 'gzip')  # preferred first when the browser accepts both equally
+
+MEDIA_CACHE_SIZE = int(os.environ.get('ARCADE_MEDIA_CACHE', 32))  # large files kept mapped (one fd each)
+STREAM_BLOCK = 64 * 1024
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600   # fingerprinted URLs never change content
+FINGERPRINT_LENGTH = 10               # hex digits of the content hash in a fingerprinted name
+PAGE_TYPES = {'text/html'}
+# src="..." / href="..." attributes in a page
+ASSET_REFERENCE = re.compile(r"""(\b(?:src|href)\s*=\s*)(["'])([^"'<>]+)\2""", re.IGNORECASE)
+
+MAX_PRELOADS = 8   # Link: rel=preload entries per page (its blocking scripts and styles)
+# url(...) and @import in a stylesheet; quoted file names in a script
+STYLE_REFERENCE = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)|@import\s+(['"])([^'"]+)\3""")
+SCRIPT_REFERENCE = re.compile(r"""(['"`])([\w./-]+\.(?:png|jpe?g|gif|webp|avif|svg|mp3|ogg|wav|json|css|js))\1""")
+
+
+def compressible(mimetype):
+    return mimetype in COMPRESSIBLE_TYPES
+
+
+def compress_variants(data):
+    """Precompressed bodies keyed by content coding, keeping only ones that save space"""
+    variants = {'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(data, quality=11)
+    return {encoding: body for encoding, body in variants.items() if len(body) < len(data) * 0.9}
+
+
+def choose_encoding(variants, accept_encodings):
+    """The variant to send for an Accept-Encoding header, or None for the plain file"""
+    best = None
+    best_quality = 0
+    for encoding in ENCODINGS:
+        if encoding not in variants:
+            continue
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def fingerprinted(url, digest):
+    """game.js -> game.3f2a9c1b0e.js"""
+    stem, ext = posixpath.splitext(url)
+    return f"{stem}.{digest[:FINGERPRINT_LENGTH]}{ext}"
+
+
+def local_target(base, reference):
+    """(url path, query) a relative reference points at from directory base, or None"""
+    if reference.startswith(('/', '#')) or ':' in reference.split('/', 1)[0]:
+        # Absolute, anchor, or another scheme (https:, data:, mailto:)
+        return None
+    path, query = re.match(r'([^?#]*)(.*)', reference).groups()
+    if not path:
+        return None
+    return posixpath.normpath(posixpath.join(base, path)), query
+
+
+def rewrite_page(html, page_url, fingerprints):
+    """Point a page's relative src/href links at fingerprinted URLs where known"""
+    base = posixpath.dirname(page_url)
+
+    def swap(match):
+        reference = match.group(3)
+        local = local_target(base, reference)
+        if local is None:
+            return match.group(0)
+        target, query = local
+        path = reference[:len(reference) - len(query)]
+        hashed = fingerprints.get(target)
+        if hashed is None:
+            return match.group(0)
+        # Keep the page's own way of writing the path; only the file name changes
+        new_path = posixpath.join(posixpath.dirname(path), posixpath.basename(hashed))
+        return f"{match.group(1)}{match.group(2)}{new_path}{query}{match.group(2)}"
+
+    return ASSET_REFERENCE.sub(swap, html)
+
+
+class PageReferences(HTMLParser):
+    """Subresources a page's markup names: [(reference, destination, critical)] in document order"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.references = []
+        self._media = None   # the <audio>/<video> a <source> belongs to
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'script' and attrs.get('src'):
+            module = (attrs.get('type') or '').lower() == 'module'
+            self.references.append((attrs['src'], 'module' if module else 'script', 'async' not in attrs))
+        elif tag == 'link' and attrs.get('href'):
+            rel = (attrs.get('rel') or '').lower().split()
+            if 'stylesheet' in rel:
+                self.references.append((attrs['href'], 'style', True))
+            elif 'icon' in rel:
+                self.references.append((attrs['href'], 'image', False))
+        elif tag == 'img' and attrs.get('src'):
+            self.references.append((attrs['src'], 'image', False))
+        elif tag in ('audio', 'video'):
+            self._media = tag
+            if attrs.get('src'):
+                self.references.append((attrs['src'], tag, False))
+            if attrs.get('poster'):
+                self.references.append((attrs['poster'], 'image', False))
+        elif tag == 'source' and attrs.get('src') and self._media:
+            self.references.append((attrs['src'], self._media, False))
+
+    def handle_endtag(self, tag):
+        if tag in ('audio', 'video'):
+            self._media = None
+
+
+def destination(url):
+    """What a file is fetched as (preload's `as`), by its type"""
+    mimetype, _ = mimetypes.guess_type(url)
+    mimetype = mimetype or ''
+    if mimetype == 'text/css':
+        return 'style'
+    if 'javascript' in mimetype:
+        return 'script'
+    kind = mimetype.split('/')[0]
+    if kind in ('image', 'audio', 'video', 'font'):
+        return kind
+    return 'fetch'
+
+
+def preload_link(prefix, url, destination):
+    """One Link header entry telling the browser to fetch url now"""
+    target = quote(f"{prefix}/{url}")
+    if destination == 'module':
+        return f"<{target}>; rel=modulepreload"
+    return f"<{target}>; rel=preload; as={destination}"
+
+
+def content_digest(data):
+    """Hex content hash of some bytes (the ETag and fingerprint of an asset)"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def self_fingerprinted(url, digest):
+    """True for a name that already carries its own content hash (a sprite atlas page)"""
+    stem, _ = posixpath.splitext(url)
+    return stem.endswith('.' + digest[:FINGERPRINT_LENGTH])
+
+
+def gets_variants(asset):
+    """True for images served as AVIF/WebP/resized variants
+
+    Not for atlas pages (named by their own hash): the game cuts sprites out of
+    them by pixel coordinates, so lossy or resized copies would smear the frames.
+    """
+    return images.handles(asset.mimetype) and not self_fingerprinted(os.path.basename(asset.path), asset.digest)
+
+
+def file_digest(path):
+    """Hex content hash of a file, read in chunks"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Asset:
+    """One servable file: where it is, what it is, and its validators
+
+    data, when given, is served instead of the file's contents (a rewritten
+    page) and always kept in memory.
+    """
+
+    def __init__(self, path, stat, data=None):
+        rewritten = data is not None
+        self.path = path
+        self.stat = stat
+        self.size = len(data) if rewritten else stat.st_size
+        self.mtime_ns = stat.st_mtime_ns
+        self.mtime = stat.st_mtime
+        mimetype, _ = mimetypes.guess_type(path)
+        self.mimetype = mimetype or 'application/octet-stream'
+        self.body = None
+        self.variants = {}   # content coding -> compressed body, built here and never per request
+        if rewritten or self.size <= MAX_CACHED_FILE or (
+                compressible(self.mimetype) and self.size >= MIN_COMPRESS):
+            if not rewritten:
+                with open(path, 'rb') as handle:
+                    data = handle.read()
+            self.digest = content_digest(data)
+            if rewritten or self.size <= MAX_CACHED_FILE:
+                self.body = data
+            if compressible(self.mimetype) and self.size >= MIN_COMPRESS:
+                self.variants = compress_variants(data)
+        else:
+            self.digest = file_digest(path)
+
+    @property
+    def etag(self):
+        return self.digest
+
+
+class MappedRange(io.RawIOBase):
+    """Read-only file over bytes [start, stop) of a memory-mapped file
+
+    Handed to wsgi.file_wrapper: waitress then sends it from its I/O loop, so
+    the worker thread is free as soon as the headers are out, however slow
+    the client is.
+    """
+
+    def __init__(self, mapped, start, stop, release=None):
+        super().__init__()
+        self._mapped = mapped
+        self._release = release   # called once, on close, to give the mapping back
+        self._start = start
+        self._stop = stop
+        self._pos = start
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos - self._start
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: self._start, io.SEEK_CUR: self._pos, io.SEEK_END: self._stop}[whence]
+        self._pos = min(max(base + offset, self._start), self._stop)
+        return self.tell()
+
+    def read(self, size=-1):
+        end = self._stop if size is None or size < 0 else min(self._pos + size, self._stop)
+        data = self._mapped[self._pos:end]
+        self._pos = end
+        return data
+
+    def close(self):
+        # The mapping belongs to the MediaFiles cache; it is closed when evicted and unused
+        release, self._release = self._release, None
+        self._mapped = None
+        if release is not None:
+            release()
+        super().close()
+
+
+class MediaFiles:
+    """Bounded LRU of memory-mapped large files (each holds one descriptor)
+
+    Every open() is matched by a release(). A mapping pushed out of the LRU
+    stays open while responses are still streaming from it and is closed by
+    the last release().
+    """
+
+    def __init__(self, size=MEDIA_CACHE_SIZE):
+        self.size = max(1, size)
+        self._maps = OrderedDict()   # (path, mtime_ns) -> mmap
+        self._readers = {}           # id(mmap) -> responses reading it
+        self._lock = threading.Lock()
+
+    def open(self, asset):
+        """The file's mapping, held for the caller until release()"""
+        key = (asset.path, asset.mtime_ns)
+        with self._lock:
+            mapped = self._maps.get(key)
+            if mapped is not None:
+                self._maps.move_to_end(key)
+                self._readers[id(mapped)] += 1
+                return mapped
+        with open(asset.path, 'rb') as handle:
+            mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        unused = []
+        with self._lock:
+            self._readers[id(mapped)] = 1
+            # A request racing this one may have mapped the same file; its map is dropped like an evicted one
+            replaced = self._maps.pop(key, None)
+            self._maps[key] = mapped
+            evicted = [replaced] if replaced is not None else []
+            while len(self._maps) > self.size:
+                evicted.append(self._maps.popitem(last=False)[1])
+            for old in evicted:
+                if not self._readers[id(old)]:
+                    del self._readers[id(old)]
+                    unused.append(old)
+        for old in unused:
+            old.close()
+        return mapped
+
+    def release(self, mapped):
+        """Done reading a mapping from open(); closes it if it was evicted meanwhile"""
+        with self._lock:
+            self._readers[id(mapped)] -= 1
+            if self._readers[id(mapped)] or any(cached is mapped for cached in self._maps.values()):
+                return
+            del self._readers[id(mapped)]
+        mapped.close()
+
+
+media_files = MediaFiles()
+images = ImageVariants()
+
+
+def stream_response(asset, request):
+    """Large file straight from its mapping: 304, 206 for a Range, or the whole file"""
+    response = Response(mimetype=asset.mimetype, direct_passthrough=True)
+    response.set_etag(asset.etag)
+    response.last_modified = asset.mtime
+    response.accept_ranges = 'bytes'
+    if not is_resource_modified(request.environ, etag=asset.etag,
+                                last_modified=response.headers['Last-Modified']):
+        response.status_code = 304
+        return response
+
+    start, stop = 0, asset.size
+    if request.range is not None and range_still_valid(request, asset):
+        span = request.range.range_for_length(asset.size)
+        if span is None:
+            response.status_code = 416
+            response.content_range = ContentRange('bytes', None, None, asset.size)
+            return response
+        start, stop = span
+        response.status_code = 206
+        response.content_range = ContentRange('bytes', start, stop, asset.size)
+    response.content_length = stop - start
+    if request.method == 'HEAD':
+        return response
+
+    mapped = media_files.open(asset)
+    body = MappedRange(mapped, start, stop, release=lambda: media_files.release(mapped))
+    file_wrapper = request.environ.get('wsgi.file_wrapper')
+    if file_wrapper is not None:
+        # The server closes the wrapper, and so the body, once it is sent
+        response.response = file_wrapper(body, STREAM_BLOCK)
+    else:
+        # Servers without a file wrapper (the Flask dev server) get plain chunks
+        response.response = ClosingIterator(iter(lambda: body.read(STREAM_BLOCK), b''), body.close)
+    return response
+
+
+def range_still_valid(request, asset):
+    """False when If-Range says the browser's partial copy is of an older file"""
+    if_range = request.if_range
+    if if_range.etag is not None:
+        return if_range.etag == asset.etag
+    if if_range.date is not None:
+        return asset.mtime <= if_range.date.timestamp()
+    return True
+
+
+class AssetManifest:
+    """URL -> Asset map for one game directory, kept in step with the files"""
+
+    def __init__(self, root, main_file, check_interval=CHECK_INTERVAL):
+        self.root = root
+        self.main_file = main_file
+        self.check_interval = check_interval
+        self.assets = {}     # url path ('' is the main page) -> Asset
+        self.immutable = set()  # fingerprinted url paths
+        self._files = {}     # absolute path -> Asset, shared by every URL that maps to it
+        self._pages = {}     # page path -> (source Asset, rewritten Asset)
+        self._variants = {}  # image variant path -> Asset
+        self._references = {}  # file path -> (Asset, references scanned from it)
+        self.dependencies = {}  # page url -> its subresources and theirs (dependency_graph())
+        self._preloads = {}  # page file path -> [(url, destination)] sent as Link: rel=preload
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.build()
+
+    def build(self):
+        """Walk the game directory and (re)build the URL map; unchanged files keep their Asset"""
+        files = {}
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = sorted(d for d in dirnames if d not in SKIP_DIRS and not d.startswith('.'))
+            for filename in sorted(filenames):
+                if filename.startswith('.') or filename.endswith(SKIP_SUFFIXES):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                old = self._files.get(path)
+                if old is not None and old.mtime_ns == stat.st_mtime_ns and old.size == stat.st_size:
+                    files[path] = old
+                    continue
+                try:
+                    files[path] = Asset(path, stat)
+                except OSError:
+                    continue
+                # New or changed image: encode its variants in the background
+                if gets_variants(files[path]):
+                    images.add(path, files[path].digest, files[path].mimetype)
+
+        assets = {}
+        for path, asset in files.items():
+            assets[os.path.relpath(path, self.root).replace(os.sep, '/')] = asset
+        # Same fallbacks as before: static/game.js also answers for game.js
+        for subdir in SEARCH_DIRS:
+            prefix = subdir + '/'
+            for url, asset in list(assets.items()):
+                if url.startswith(prefix):
+                    assets.setdefault(url[len(prefix):], asset)
+        main = assets.get(self.main_file)
+        if main is not None:
+            assets[''] = main
+
+        # Content-hashed aliases for everything but pages, cached as immutable
+        hashed_names = {url for url, asset in assets.items() if url and self_fingerprinted(url, asset.digest)}
+        fingerprints = {url: fingerprinted(url, asset.digest)
+                        for url, asset in assets.items()
+                        if url and asset.mimetype not in PAGE_TYPES and url not in hashed_names}
+        for url, hashed in fingerprints.items():
+            assets[hashed] = assets[url]
+
+        # Pages are served with their links pointing at those aliases
+        pages = {}
+        for url, asset in list(assets.items()):
+            if asset.mimetype not in PAGE_TYPES:
+                continue
+            if asset.path not in pages:
+                pages[asset.path] = (asset, self._rewrite_page(asset, fingerprints))
+            assets[url] = pages[asset.path][1]
+
+        dependencies, preloads = self._dependency_graph(assets, pages)
+
+        self._files = files
+        self._pages = pages
+        self.dependencies = dependencies
+        self._preloads = preloads
+        # Variants of images that changed or went away are dropped with them
+        digests = {asset.digest for asset in files.values()}
+        self._variants = {path: variant for path, variant in self._variants.items()
+                          if os.path.basename(path).split('-', 1)[0] in digests}
+        self.assets = assets
+        self.immutable = set(fingerprints.values()) | hashed_names
+        self._checked_at = time.monotonic()
+
+    def _rewrite_page(self, page, fingerprints):
+        """The page with fingerprinted links (the previous copy while nothing changed)"""
+        if page.body is not None:
+            source = page.body
+        else:
+            with open(page.path, 'rb') as handle:
+                source = handle.read()
+        page_url = os.path.relpath(page.path, self.root).replace(os.sep, '/')
+        html = rewrite_page(source.decode('utf-8', 'surrogateescape'), page_url, fingerprints)
+        body = html.encode('utf-8', 'surrogateescape')
+        old = self._pages.get(page.path)
+        if old is not None and old[0] is page and old[1].body == body:
+            # Unchanged: keep the old copy and its compressed variants
+            return old[1]
+        return Asset(page.path, page.stat, data=body)
+
+    def _dependency_graph(self, assets, pages):
+        """What each page loads, and what those scripts and styles load in turn
+
+        Returns ({page url: {...}}, {page file path: [(url, destination)] to preload}).
+        """
+        references = {}
+        dependencies = {}
+        preloads = {}
+        for path, (_, page) in pages.items():
+            page_url = os.path.relpath(path, self.root).replace(os.sep, '/')
+            base = posixpath.dirname(page_url)
+            entries = []
+            nested = {}
+            for reference, kind, critical in self._scan(page, references, 'page'):
+                local = local_target(base, reference)
+                if local is None:
+                    continue
+                url = local[0]
+                asset = assets.get(url)
+                entries.append({'url': url, 'as': kind, 'critical': critical, 'found': asset is not None})
+                if asset is None or kind not in ('script', 'module', 'style') or url in nested:
+                    continue
+                # Scripts name files relative to the page; stylesheets relative to themselves
+                inner_base = posixpath.dirname(url) if kind == 'style' else base
+                nested[url] = []
+                for inner, inner_kind, _ in self._scan(asset, references, kind):
+                    inner_local = local_target(inner_base, inner)
+                    if inner_local is None or (kind != 'style' and inner_local[0] not in assets):
+                        # Quoted names in a script are only a guess; keep the ones that exist
+                        continue
+                    nested[url].append({'url': inner_local[0], 'as': inner_kind,
+                                        'found': inner_local[0] in assets})
+            preload = []
+            for entry in entries:
+                if entry['critical'] and entry['found'] and (entry['url'], entry['as']) not in preload:
+                    preload.append((entry['url'], entry['as']))
+            preloads[path] = preload[:MAX_PRELOADS]
+            dependencies[page_url] = {
+                'main': page_url == self.main_file,
+                'preload': [url for url, _ in preloads[path]],
+                'references': entries,
+                'nested': nested,
+            }
+        self._references = references
+        return dependencies, preloads
+
+    def _scan(self, asset, references, kind):
+        """References in one file (the previous scan while the file is unchanged)"""
+        old = self._references.get(asset.path)
+        if old is not None and old[0] is asset:
+            references[asset.path] = old
+            return old[1]
+        if asset.body is not None:
+            data = asset.body
+        else:
+            with open(asset.path, 'rb') as handle:
+                data = handle.read()
+        text = data.decode('utf-8', 'replace')
+        if kind == 'page':
+            parser = PageReferences()
+            parser.feed(text)
+            parser.close()
+            found = parser.references
+        elif kind == 'style':
+            found = [((match.group(2) or match.group(4)).strip(),
+                      'style' if match.group(4) else destination(match.group(2)), False)
+                     for match in STYLE_REFERENCE.finditer(text)]
+        else:
+            found = [(match.group(2), destination(match.group(2)), False)
+                     for match in SCRIPT_REFERENCE.finditer(text)]
+        references[asset.path] = (asset, found)
+        return found
+
+    def dependency_graph(self):
+        """Each page's subresources, what it preloads, and what its scripts and styles load"""
+        self._maybe_refresh()
+        return {'main_file': self.main_file, 'pages': self.dependencies}
+
+    def lookup(self, url):
+        """The Asset for a URL path (no leading slash), or None"""
+        self._maybe_refresh()
+        return self.assets.get(url)
+
+    def serve(self, url, request):
+        """A response for the URL (304 when the browser's copy is current), or None"""
+        asset = self.lookup(url)
+        if asset is None:
+            return None
+        links = None
+        if asset.mimetype in PAGE_TYPES and self._preloads.get(asset.path):
+            links = [preload_link(request.script_root, url, kind) for url, kind in self._preloads[asset.path]]
+            early_hints = request.environ.get('wsgi.early_hints')
+            if early_hints is not None and request.method == 'GET':
+                # Lets the browser start on these before the page itself is sent
+                early_hints([('Link', link) for link in links])
+        source = asset
+        if gets_variants(asset):
+            asset = self._variant(images.choose(asset.digest, request)) or asset
+        encoding = choose_encoding(asset.variants, request.accept_encodings)
+        if encoding is not None:
+            # Each coding is a different representation, so it needs its own strong ETag
+            response = Response(asset.variants[encoding], mimetype=asset.mimetype)
+            response.content_encoding = encoding
+            response.set_etag(f"{asset.etag}-{encoding}")
+            response.last_modified = asset.mtime
+            response.make_conditional(request)
+        elif asset.body is None:
+            response = stream_response(asset, request)
+        else:
+            response = Response(asset.body, mimetype=asset.mimetype)
+            response.set_etag(asset.etag)
+            response.last_modified = asset.mtime
+            response.make_conditional(request, accept_ranges=True, complete_length=len(asset.body))
+        if asset.variants:
+            # Caches must keep the plain and compressed copies apart
+            response.vary.add('Accept-Encoding')
+        if gets_variants(source):
+            # The image sent depends on the formats and width the browser asked for
+            response.vary.update(IMAGE_VARY)
+        if links and response.status_code == 200:
+            response.headers['Link'] = ', '.join(links)
+        if url in self.immutable:
+            # The name changes whenever the content does, so this copy is good forever
+            response.cache_control.public = True
+            response.cache_control.max_age = IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+        elif asset.mimetype in PAGE_TYPES:
+            # Pages revalidate every time (a 304 is cheap); assets may be reused for a while
+            response.cache_control.no_cache = True
+            response.cache_control.max_age = None
+        else:
+            response.cache_control.public = True
+            response.cache_control.max_age = ASSET_MAX_AGE
+        return response
+
+    def _variant(self, path):
+        """The Asset for a cached image variant (None for no variant)"""
+        if path is None:
+            return None
+        variant = self._variants.get(path)
+        if variant is None:
+            try:
+                variant = Asset(path, os.stat(path))
+            except OSError:
+                # Cleared from the cache directory: fall back to the original
+                return None
+            self._variants[path] = variant
+        return variant
+
+    def _maybe_refresh(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        # Re-check in the background; requests keep using the current map meanwhile
+        if not self._lock.acquire(blocking=False):
+            return
+        self._checked_at = now
+        threading.Thread(target=self._refresh, daemon=True).start()
+
+    def _refresh(self):
+        try:
+            self.build()
+        finally:
+            self._lock.release()
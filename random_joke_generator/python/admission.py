@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Admission control for the Kid's Joke Generator
+Token-bucket rate limits (per client and global) plus a bounded wait queue
+in front of live model calls, so bursts are shed quickly instead of piling
+up behind Bedrock
+"""
+
+import math
+import time
+import asyncio
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager, asynccontextmanager
+
+
+class Overloaded(Exception):
+    """Request shed by admission control"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        # reason: 'client_rate', 'global_rate', 'queue_full' or 'queue_timeout'
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+        # 429 for rate limits, 503 when the service itself is saturated
+        self.status = 429 if reason.endswith('_rate') else 503
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, up to `burst` saved up"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def take(self):
+        """Take a token; returns 0 on success, else seconds until one is available"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class AdmissionController:
+    """Rate limits plus a bounded, deadline-limited queue for model calls"""
+
+    def __init__(self, client_rate=1.0, client_burst=5, global_rate=20.0, global_burst=40,
+                 max_concurrent=4, max_queue=16, queue_timeout=5.0, max_clients=10000):
+        # A rate of 0 turns that limit off
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.max_clients = max_clients
+        self.global_bucket = TokenBucket(global_rate, global_burst) if global_rate > 0 else None
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+
+        self._clients = OrderedDict()
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting = 0
+        # Average time a call holds a slot, used to suggest Retry-After
+        self._hold_avg = 1.0
+
+        self.admitted = 0
+        self.rejected = {'client_rate': 0, 'global_rate': 0, 'queue_full': 0, 'queue_timeout': 0}
+        self._waits = deque(maxlen=1000)
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def check_rate(self, client):
+        """Spend one token for this client and globally; raises Overloaded when out"""
+        with self._cond:
+            if self.client_rate > 0:
+                bucket = self._clients.get(client)
+                if bucket is None:
+                    bucket = self._clients[client] = TokenBucket(self.client_rate, self.client_burst)
+                    if len(self._clients) > self.max_clients:
+                        self._clients.popitem(last=False)
+                else:
+                    self._clients.move_to_end(client)
+                wait = bucket.take()
+                if wait:
+                    self.rejected['client_rate'] += 1
+                    raise Overloaded('client_rate', wait)
+            if self.global_bucket:
+                wait = self.global_bucket.take()
+                if wait:
+                    self.rejected['global_rate'] += 1
+                    raise Overloaded('global_rate', wait)
+
+    def reserve(self):
+        """Take a place in line now for a slot() that starts on another thread
+        
+        The place counts in queue_depth (and against max_queue) straight away,
+        so work handed to a thread pool never waits where nobody sees it. Pass
+        the returned time to slot(). Raises Overloaded when the queue is full.
+        """
+        with self._cond:
+            # Places taken for free slots don't count against max_queue
+            if self._waiting >= self.max_queue + max(0, self.max_concurrent - self._active):
+                self._reject('queue_full')
+            self._waiting += 1
+            return time.monotonic()
+
+    @contextmanager
+    def slot(self, reserved_at=None):
+        """Hold one model-call slot, queueing up to queue_timeout seconds for it
+        
+        reserved_at is the time reserve() took this call's place in line; the
+        queue timeout runs from then.
+        """
+        started = time.monotonic() if reserved_at is None else reserved_at
+        with self._cond:
+            if reserved_at is not None or self._active >= self.max_concurrent:
+                if reserved_at is None:
+                    self._enqueue()
+                try:
+                    deadline = started + self.queue_timeout
+                    while self._active >= self.max_concurrent:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._reject('queue_timeout')
+                        self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            admitted_at = self._admit(started)
+        try:
+            yield
+        finally:
+            self._leave(admitted_at)
+
+    @asynccontextmanager
+    async def aslot(self):
+        """Async slot for the ASGI server; waits without blocking the event loop"""
+        started = time.monotonic()
+        with self._cond:
+            if self._active < self.max_concurrent:
+                admitted_at = self._admit(started)
+            else:
+                self._enqueue()
+                admitted_at = None
+        if admitted_at is None:
+            deadline = started + self.queue_timeout
+            delay = 0.005
+            try:
+                while True:
+                    with self._cond:
+                        if self._active < self.max_concurrent:
+                            admitted_at = self._admit(started)
+                            break
+                        if time.monotonic() >= deadline:
+                            self._reject('queue_timeout')
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, 0.05)
+            finally:
+                with self._cond:
+                    self._waiting -= 1
+        try:
+            yield
+        finally:
+            self._leave(admitted_at)
+
+    def stats(self):
+        """Queue depth, in-flight calls, rejections and queue wait times"""
+        with self._cond:
+            waits = sorted(self._waits)
+            return {
+                'active': self._active,
+                'queue_depth': self._waiting,
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue,
+                'admitted': self.admitted,
+                'rejected': dict(self.rejected),
+                'wait_seconds': {
+                    'avg': self._wait_total / self.admitted if self.admitted else 0.0,
+                    'p50': waits[len(waits) // 2] if waits else 0.0,
+                    'p95': waits[int(len(waits) * 0.95)] if waits else 0.0,
+                    'max': self._wait_max
+                }
+            }
+
+    def _enqueue(self):
+        # Caller holds the lock
+        if self._waiting >= self.max_queue:
+            self._reject('queue_full')
+        self._waiting += 1
+
+    def _reject(self, reason):
+        # Caller holds the lock; suggest retrying once the queue ahead has drained
+        self.rejected[reason] += 1
+        backlog = (self._waiting + 1) / self.max_concurrent
+        raise Overloaded(reason, backlog * self._hold_avg)
+
+    def _admit(self, started):
+        # Caller holds the lock; returns the admission time
+        now = time.monotonic()
+        waited = now - started
+        self._active += 1
+        self.admitted += 1
+        self._waits.append(waited)
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+        return now
+
+    def _leave(self, admitted_at):
+        with self._cond:
+            self._active -= 1
+            held = time.monotonic() - admitted_at
+            self._hold_avg = 0.9 * self._hold_avg + 0.1 * held
+            self._cond.notify()
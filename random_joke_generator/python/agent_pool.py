@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Agent pool for the Kid's Joke Generator
+Hands out one Strands agent per call so threads never share an agent,
+and trims each agent's conversation history when it comes back
+"""
+
+import time
+import queue
+import asyncio
+import threading
+import logging
+from contextlib import contextmanager, asynccontextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class AgentPool:
+    """Fixed-size pool of agents with checkout/return semantics"""
+
+    def __init__(self, factory, size=4, history_limit=0):
+        # factory() -> new Agent; history_limit = messages kept between calls
+        self.factory = factory
+        self.size = max(1, size)
+        self.history_limit = max(0, history_limit)
+        # Each slot holds an idle agent, or None until an agent is built for it
+        self._idle = queue.LifoQueue()
+        for _ in range(self.size):
+            self._idle.put(None)
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def prime(self):
+        """Build one agent up front so setup problems show up at startup"""
+        agent = self._acquire(timeout=None)
+        self._release(agent)
+
+    @contextmanager
+    def checkout(self, timeout=None):
+        """Borrow an agent; waits up to timeout seconds when all are busy"""
+        agent = self._acquire(timeout)
+        try:
+            yield agent
+        except Exception:
+            # An agent that failed mid-call may hold a half-written turn
+            self._discard(agent)
+            raise
+        else:
+            self._release(agent)
+
+    @asynccontextmanager
+    async def acheckout(self, timeout=None):
+        """Async checkout for the ASGI server; waits without blocking the event loop"""
+        agent = await self._acquire_async(timeout)
+        try:
+            yield agent
+        except asyncio.CancelledError:
+            # Timeouts, disconnected clients and lost hedges are routine; replace quietly
+            self._discard(agent, cancelled=True)
+            raise
+        except BaseException:
+            self._discard(agent)
+            raise
+        else:
+            self._release(agent)
+
+    def stats(self):
+        """Pool size, agents built so far and slots currently free"""
+        return {
+            'size': self.size,
+            'created': self._created,
+            'idle': self._idle.qsize()
+        }
+
+    def _acquire(self, timeout):
+        try:
+            agent = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No agent free after {timeout}s (pool size {self.size})")
+        if agent is not None:
+            return agent
+
+        try:
+            agent = self.factory()
+        except Exception:
+            self._idle.put(None)
+            raise
+        return self._built(agent)
+
+    async def _acquire_async(self, timeout):
+        # Threads share the same slots, so poll with a short backoff
+        deadline = None if timeout is None else time.monotonic() + timeout
+        delay = 0.005
+        while True:
+            try:
+                agent = self._idle.get_nowait()
+                break
+            except queue.Empty:
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise TimeoutError(f"No agent free after {timeout}s (pool size {self.size})")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 0.05)
+        if agent is not None:
+            return agent
+
+        try:
+            # Building an agent can block (imports, AWS clients)
+            agent = await asyncio.to_thread(self.factory)
+        except BaseException:
+            self._idle.put(None)
+            raise
+        return self._built(agent)
+
+    def _built(self, agent):
+        with self._lock:
+            self._created += 1
+        return agent
+
+    def _release(self, agent):
+        self._trim_history(agent)
+        self._idle.put(agent)
+
+    def _discard(self, agent, cancelled=False):
+        if cancelled:
+            logger.debug("Discarded an agent after a cancelled call")
+        else:
+            logger.warning("Discarded an agent after a failed call")
+        self._idle.put(None)
+
+    def _trim_history(self, agent):
+        """Drop the oldest turns so prompts don't grow with uptime"""
+        messages = getattr(agent, 'messages', None)
+        if messages is None:
+            return
+        excess = len(messages) - self.history_limit
+        if excess <= 0:
+            return
+        # Keep whole user/assistant pairs
+        excess += excess % 2
+        del messages[:excess]
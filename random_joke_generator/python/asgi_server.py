@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+Async (ASGI) serving mode for the Kid's Joke Generator
+Serves /api/joke, /api/joke/stream, /api/health and static files on an event
+loop, so a slow Bedrock call holds a coroutine instead of an OS thread.
+Every other /api/ endpoint is handed to the Flask app unchanged, so the
+HTTP API is the same in both modes.
+
+Start it with:  JOKE_SERVER_MODE=asgi python server.py
+Needs:          pip install starlette uvicorn
+"""
+
+import os
+import time
+import asyncio
+import logging
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, FileResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+from uvicorn.middleware.wsgi import WSGIMiddleware
+
+import server
+import metrics
+from admission import Overloaded
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Per-request limit on a live model call, in seconds
+MODEL_TIMEOUT = float(os.environ.get('JOKE_MODEL_TIMEOUT', 20))
+
+# Endpoints served natively on the event loop; other /api/ paths go to Flask
+ASYNC_PATHS = {'/api/joke', '/api/joke/stream', '/api/health'}
+
+# Flask endpoint names, so request metrics match between modes
+ENDPOINT_NAMES = {
+    '/api/joke': 'generate_joke',
+    '/api/joke/stream': 'stream_joke',
+    '/api/jokes': 'generate_jokes',
+    '/api/health': 'health_check',
+    '/metrics': 'metrics_endpoint'
+}
+
+
+class ClientDisconnected(Exception):
+    """The client went away before the joke was ready"""
+
+
+async def ask_agent_async(category):
+    """Ask the agent for one joke without blocking the event loop (retries blocked jokes)"""
+    prompt = server.CATEGORY_PROMPTS.get(category, server.CATEGORY_PROMPTS['general'])
+
+    for _ in range(server.SAFETY_RETRIES + 1):
+        async with server.agent_pool.acheckout(timeout=server.AGENT_WAIT_TIMEOUT) as agent:
+            with server.model_call(category, 'single'):
+                response = await agent.invoke_async(prompt)
+        server.record_usage(category, 'single', response)
+
+        joke = server.response_text(response)
+        if server.check_safe(category, joke, 'live'):
+            server.save_jokes(category, [joke])
+            return joke
+    raise server.UnsafeJoke(category)
+
+async def ask_agent_unseen_async(category, skip):
+    """ask_agent_async, asking again while the joke is one this session has seen"""
+    joke = await ask_agent_async(category)
+    for _ in range(server.DEDUPE_RETRIES):
+        if not skip or not skip(joke):
+            return joke
+        server.REPEATS.inc(category=category, action='retry')
+        joke = await ask_agent_async(category)
+    return server.unseen_or_repeat(category, joke, skip)
+
+async def hedged_joke_async(request, category, skip, budget):
+    """(joke, source): async twin of server.hedged_joke, cancelling the losing model call"""
+    async def live():
+        async with server.admission.aslot():
+            return await ask_agent_unseen_async(category, skip)
+
+    budget = min(budget, MODEL_TIMEOUT)
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    task = asyncio.ensure_future(live())
+    delay = server.hedge_delay()
+    hedge = min(delay, budget / 2) if delay > 0 else budget
+    try:
+        try:
+            # Shielded: reaching the hedge delay must not cancel the model call
+            joke = await call_until_disconnect(request, asyncio.shield(task), hedge)
+            server.HEDGE_WINS.inc(category=category, winner='model')
+            return joke, 'live'
+        except asyncio.TimeoutError:
+            pass
+
+        if delay > 0:
+            server.HEDGES.inc(category=category)
+            joke = server.local_joke(category, skip)
+            if joke is not None:
+                server.HEDGE_WINS.inc(category=category, winner='local')
+                return joke, 'local'
+
+        joke = await call_until_disconnect(request, task, max(0, budget - (loop.time() - started)))
+        server.HEDGE_WINS.inc(category=category, winner='model')
+        return joke, 'live'
+    finally:
+        if not task.done():
+            task.cancel()
+
+async def call_until_disconnect(request, coro, timeout):
+    """Await coro, cancelling it on timeout or when the client disconnects"""
+    task = asyncio.ensure_future(coro)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=min(0.25, max(0, deadline - loop.time())))
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                raise ClientDisconnected()
+            if loop.time() >= deadline:
+                raise asyncio.TimeoutError(f"Model call took longer than {timeout}s")
+    finally:
+        if not task.done():
+            task.cancel()
+
+async def generate_joke(request):
+    """Generate a kid-friendly joke (async twin of server.generate_joke)"""
+    try:
+        data = await request.json()
+        category = data.get('category', 'general')
+        pool_category = category if category in server.CATEGORY_PROMPTS else 'general'
+        budget = server.request_budget(data)
+        server.admission.check_rate(server.rate_key(request.cookies, client_address(request)))
+        session, new_session = server.session_id(request.cookies)
+        skip = server.seen_filter(session)
+
+        # Serve a pre-generated joke when one is ready, otherwise ask live
+        joke = server.joke_pool.get(pool_category, skip) if server.joke_pool else None
+        if joke and not server.check_safe(pool_category, joke, 'pool'):
+            joke = None
+        source = 'pool'
+        if joke is None and server.agent_pool is None:
+            joke, source = server.unavailable_fallback(pool_category, skip)
+            if joke is None:
+                payload, status, headers = server.unavailable_payload()
+                return JSONResponse(payload, status, headers=headers)
+        if joke is None:
+            source = 'live'
+            try:
+                joke, source = await hedged_joke_async(request, pool_category, skip, budget)
+            except (ClientDisconnected, Overloaded):
+                raise
+            except server.UnsafeJoke:
+                joke, source = server.safe_replacement(pool_category, skip)
+            except Exception as e:
+                # Bedrock is slow or down: serve a joke saved earlier instead
+                reason = 'deadline' if isinstance(e, asyncio.TimeoutError) else 'model_error'
+                joke = server.stored_fallback(pool_category, reason, skip)
+                if joke is None:
+                    raise
+                source = 'store'
+                logger.warning(f"Serving a stored joke after model error: {e!r}")
+
+        # Ensure we have a proper joke format
+        if not joke:
+            joke = server.FALLBACK_JOKE
+            source = 'fallback'
+            server.FALLBACKS.inc(category=pool_category, reason='empty_response')
+        server.JOKES_SERVED.inc(endpoint='joke', category=pool_category, source=source)
+        server.remember_joke(session, joke)
+
+        response = JSONResponse({
+            'joke': joke,
+            'category': category,
+            'success': True
+        })
+        if new_session:
+            response.set_cookie(server.SESSION_COOKIE, session, httponly=True, samesite='lax')
+        return response
+
+    except Overloaded as e:
+        # Shed quickly with a fallback joke instead of queueing without limit
+        return JSONResponse(server.shed_payload(category, e), e.status,
+                            headers={'Retry-After': str(e.retry_after)})
+    except ClientDisconnected:
+        # Nobody is listening any more; the model call has been cancelled
+        return Response(status_code=499)
+    except Exception as e:
+        logger.error(f"Error generating joke: {e!r}")
+        return JSONResponse({
+            'error': 'Sorry, I had trouble thinking of a joke right now. Try again!',
+            'success': False
+        }, 500)
+
+async def stream_joke(request):
+    """Stream a kid-friendly joke as server-sent events (same events as Flask)"""
+    if request.method == 'POST':
+        try:
+            data = await request.json()
+        except ValueError:
+            data = {}
+        category = (data or {}).get('category', 'general')
+    else:
+        category = request.query_params.get('category', 'general')
+    pool_category = category if category in server.CATEGORY_PROMPTS else 'general'
+    session, new_session = server.session_id(request.cookies)
+    skip = server.seen_filter(session)
+    headers = {
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    }
+
+    try:
+        server.admission.check_rate(server.rate_key(request.cookies, client_address(request)))
+    except Overloaded as e:
+        # EventSource can't read error bodies, so shed with a normal stream
+        headers['Retry-After'] = str(e.retry_after)
+        return StreamingResponse(iter(server.shed_events(category, e)), media_type='text/event-stream',
+                                 headers=headers)
+
+    async def events():
+        stream = server.JokeStream(category)
+        try:
+            # A pre-generated or saved joke needs no streaming
+            joke = server.joke_pool.get(pool_category, skip) if server.joke_pool else None
+            if joke and not server.check_safe(pool_category, joke, 'pool'):
+                joke = None
+            source = 'pool'
+            if joke is None and server.agent_pool is None:
+                joke, source = server.unavailable_fallback(pool_category, skip)
+                if joke is None:
+                    payload, _, headers = server.unavailable_payload()
+                    if headers:
+                        payload['retry_after'] = server.WARMUP_RETRY_AFTER
+                    yield server.sse_event('joke-error', payload)
+                    return
+            if joke is None:
+                source = 'live'
+                try:
+                    async with server.admission.aslot():
+                        async for chunk in stream_agent_async(pool_category):
+                            for event in stream.add(chunk):
+                                yield event
+                        for event in stream.flush():
+                            yield event
+                except Overloaded as e:
+                    for event in server.shed_events(category, e):
+                        yield event
+                    return
+                except server.UnsafeJoke:
+                    # Stop the model; 'done' carries a safe joke for the page to show instead
+                    joke, source = server.safe_replacement(pool_category, skip)
+                except Exception as e:
+                    # Nothing sent yet, so a saved joke can still stand in
+                    joke = None if stream.sent else server.stored_fallback(pool_category, 'model_error', skip)
+                    if joke is None:
+                        raise
+                    source = 'store'
+                    logger.warning(f"Serving a stored joke after model error: {e!r}")
+                else:
+                    server.save_jokes(pool_category, [stream.text.strip()])
+                    # Streamed text can't be taken back, so a repeat is only counted
+                    if skip and skip(stream.text):
+                        server.REPEATS.inc(category=pool_category, action='served')
+            for event in stream.finish(joke):
+                yield event
+            server.JOKES_SERVED.inc(endpoint='stream', category=pool_category, source=source)
+            server.remember_joke(session, joke or stream.text.strip())
+
+        except Exception as e:
+            logger.error(f"Error streaming joke: {e!r}")
+            yield server.sse_event('joke-error', {
+                'error': 'Sorry, I had trouble thinking of a joke right now. Try again!',
+                'success': False
+            })
+
+    # Starlette cancels the generator (and the model call) if the client leaves
+    response = StreamingResponse(events(), media_type='text/event-stream', headers=headers)
+    if new_session:
+        response.set_cookie(server.SESSION_COOKIE, session, httponly=True, samesite='lax')
+    return response
+
+def client_address(request):
+    """Client address, the rate-limit key for requests without a session (same as Flask's remote_addr)"""
+    return request.client.host if request.client else None
+
+async def stream_agent_async(category):
+    """Yield the agent's text chunks, giving up after MODEL_TIMEOUT seconds"""
+    prompt = server.CATEGORY_PROMPTS.get(category, server.CATEGORY_PROMPTS['general'])
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + MODEL_TIMEOUT
+
+    async with server.agent_pool.acheckout(timeout=server.AGENT_WAIT_TIMEOUT) as agent:
+        with server.model_call(category, 'stream'):
+            events = agent.stream_async(prompt).__aiter__()
+            while True:
+                try:
+                    event = await asyncio.wait_for(events.__anext__(), max(0, deadline - loop.time()))
+                except StopAsyncIteration:
+                    return
+                if 'data' in event:
+                    yield event['data']
+                elif 'result' in event:
+                    server.record_usage(category, 'stream', event['result'])
+
+async def metrics_endpoint(request):
+    """Prometheus metrics"""
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+async def health_check(request):
+    """Health check endpoint"""
+    return JSONResponse(server.health_status())
+
+async def serve_index(request):
+    """Serve the main HTML file"""
+    response = FileResponse(os.path.join(BASE_DIR, 'index.html'))
+    # Start the session here so the first joke request is already rate-limited per browser
+    session, new_session = server.session_id(request.cookies)
+    if new_session:
+        response.set_cookie(server.SESSION_COOKIE, session, httponly=True, samesite='lax')
+    return response
+
+async def serve_static(request):
+    """Serve static files from the app directory"""
+    filename = request.path_params['filename']
+    path = os.path.realpath(os.path.join(BASE_DIR, filename))
+    if (not server.is_public_file(filename) or not path.startswith(BASE_DIR + os.sep)
+            or not os.path.isfile(path)):
+        return PlainTextResponse('Not Found', 404)
+    return FileResponse(path)
+
+
+routes = Starlette(routes=[
+    Route('/', serve_index),
+    Route('/api/joke', generate_joke, methods=['POST']),
+    Route('/api/joke/stream', stream_joke, methods=['GET', 'POST']),
+    Route('/api/health', health_check, methods=['GET']),
+    Route('/metrics', metrics_endpoint, methods=['GET']),
+    Route('/{filename:path}', serve_static, methods=['GET', 'HEAD']),
+], middleware=[
+    # Same open CORS policy as flask_cors on the Flask app
+    Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])
+])
+
+# Flask serves the remaining API endpoints through a thread pool
+flask_bridge = WSGIMiddleware(server.app)
+
+
+async def app(scope, receive, send):
+    """ASGI entry point: async routes first, everything else under /api/ via Flask"""
+    path = scope.get('path', '')
+    if scope['type'] == 'http' and path.startswith('/api/') and path not in ASYNC_PATHS:
+        # Flask records its own request metrics
+        await flask_bridge(scope, receive, send)
+        return
+    if scope['type'] != 'http' or path not in ENDPOINT_NAMES:
+        await routes(scope, receive, send)
+        return
+
+    started = time.perf_counter()
+
+    async def timed_send(message):
+        # Request latency up to the response headers, as in Flask's after_request
+        if message['type'] == 'http.response.start':
+            server.REQUEST_LATENCY.observe(time.perf_counter() - started,
+                                           endpoint=ENDPOINT_NAMES[path], status=message['status'])
+        await send(message)
+
+    await routes(scope, receive, timed_send)
+
+
+def run(host='0.0.0.0', port=8002):
+    """Serve the app with uvicorn"""
+    import uvicorn
+
+    uvicorn.run(app, host=host, port=port, log_level='warning')
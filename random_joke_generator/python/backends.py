@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Joke generation backends for the Kid's Joke Generator
+A backend builds the agents that AgentPool hands out. Every agent offers the
+same small interface as a Strands Agent:
+
+    agent(prompt)                 -> result (str(result) is the reply text)
+    await agent.invoke_async(prompt)
+    async for event in agent.stream_async(prompt):
+        {'data': text chunk} ... then {'result': result}
+    agent.messages                -> conversation history list
+
+Select one with JOKE_BACKEND:
+    bedrock  Strands Agent on Amazon Bedrock (default)
+    mock     deterministic local stand-in for load tests; no network or AWS
+"""
+
+import os
+import re
+import time
+import random
+import asyncio
+import itertools
+import threading
+
+
+class JokeBackend:
+    """Interface for joke backends"""
+
+    name = 'base'
+
+    def create_agent(self):
+        """Build one agent for the agent pool"""
+        raise NotImplementedError
+
+
+class BedrockBackend(JokeBackend):
+    """Strands Agent talking to Amazon Bedrock"""
+
+    name = 'bedrock'
+
+    def __init__(self, system_prompt, region=None, model=None):
+        # region / model: AWS region and Bedrock model ID (None = Strands defaults)
+        self.system_prompt = system_prompt
+        self.region = region
+        self.model = model
+
+    def create_agent(self):
+        from strands import Agent
+
+        options = {}
+        if self.region or self.model:
+            from strands.models import BedrockModel
+
+            settings = {'model_id': self.model} if self.model else {}
+            options['model'] = BedrockModel(region_name=self.region, **settings)
+        # No callback handler: concurrent calls would interleave their printed output
+        return Agent(system_prompt=self.system_prompt, callback_handler=None, **options)
+
+
+class MockBackendError(RuntimeError):
+    """Injected failure from the mock backend (looks like a throttled call)"""
+
+
+class MockUsage:
+    def __init__(self, input_tokens, output_tokens):
+        self.accumulated_usage = {
+            'inputTokens': input_tokens,
+            'outputTokens': output_tokens,
+            'totalTokens': input_tokens + output_tokens
+        }
+
+
+class MockResult:
+    """Stand-in for a Strands AgentResult"""
+
+    def __init__(self, text, input_tokens, output_tokens):
+        self.text = text
+        self.metrics = MockUsage(input_tokens, output_tokens)
+
+    def __str__(self):
+        return self.text
+
+
+MOCK_JOKES = {
+    'general': [
+        ("Why don't scientists trust atoms?", "Because they make up everything!"),
+        ("What do you call a sleeping bull?", "A bulldozer!"),
+        ("Why did the bicycle fall over?", "Because it was two-tired!"),
+        ("What has hands but can't clap?", "A clock!"),
+        ("Why was the math book sad?", "It had too many problems!"),
+    ],
+    'animals': [
+        ("Why don't elephants use computers?", "Because they're afraid of the mouse!"),
+        ("What do you call a fish with no eyes?", "A fsh!"),
+        ("Why do cows wear bells?", "Because their horns don't work!"),
+        ("What do you call a dog magician?", "A labracadabrador!"),
+        ("Why are frogs so happy?", "They eat whatever bugs them!"),
+    ],
+    'food': [
+        ("Why did the banana go to the doctor?", "It wasn't peeling well!"),
+        ("What do you call cheese that isn't yours?", "Nacho cheese!"),
+        ("Why did the cookie go to the nurse?", "Because it felt crummy!"),
+        ("What did the lettuce say to the celery?", "Quit stalking me!"),
+        ("Why did the tomato blush?", "Because it saw the salad dressing!"),
+    ],
+    'school': [
+        ("Why did the student eat his homework?", "Because the teacher said it was a piece of cake!"),
+        ("What's a math teacher's favorite place?", "Times Square!"),
+        ("Why did the music teacher need a ladder?", "To reach the high notes!"),
+        ("What do you call a pencil with two erasers?", "Pointless!"),
+        ("Why was school easier for cave people?", "Because there was no history to study!"),
+    ],
+    'knock-knock': [
+        ("Knock knock! Who's there? Lettuce. Lettuce who?", "Lettuce in, it's cold out here!"),
+        ("Knock knock! Who's there? Boo. Boo who?", "Don't cry, it's just a joke!"),
+        ("Knock knock! Who's there? Cow says. Cow says who?", "No silly, a cow says moo!"),
+        ("Knock knock! Who's there? Olive. Olive who?", "Olive you and I miss you!"),
+        ("Knock knock! Who's there? Tank. Tank who?", "You're welcome!"),
+    ],
+}
+
+
+def parse_latency(spec):
+    """Turn a latency spec into a sampler: rng -> seconds
+
+    fixed:0.2 | uniform:0.1,0.8 | normal:0.5,0.1 | lognormal:-0.7,0.5 | exponential:0.4
+    """
+    kind, _, args = (spec or 'fixed:0').partition(':')
+    values = [float(value) for value in args.split(',') if value.strip()]
+    kind = kind.strip().lower()
+    if kind == 'fixed':
+        return lambda rng: values[0] if values else 0.0
+    if kind == 'uniform':
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == 'normal':
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == 'lognormal':
+        return lambda rng: rng.lognormvariate(values[0], values[1])
+    if kind == 'exponential':
+        return lambda rng: rng.expovariate(1 / values[0]) if values[0] > 0 else 0.0
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class MockAgent:
+    """Deterministic, offline stand-in for a Strands Agent"""
+
+    def __init__(self, backend, seed):
+        self.backend = backend
+        self.rng = random.Random(seed)
+        self.messages = []
+
+    def _plan(self, prompt):
+        """Decide latency, failure and reply text for one call"""
+        latency = self.backend.sample_latency(self.rng)
+        fails = self.rng.random() < self.backend.failure_rate
+        text = self._reply(prompt)
+        return latency, fails, text
+
+    def _reply(self, prompt):
+        lowered = prompt.lower()
+        category = 'general'
+        for name in ('knock-knock', 'animals', 'food', 'school'):
+            if name in lowered:
+                category = name
+                break
+        jokes = MOCK_JOKES[category]
+
+        batch = re.search(r'write (\d+) different jokes', lowered)
+        if batch:
+            count = int(batch.group(1))
+            lines = []
+            for number in range(1, count + 1):
+                setup, punchline = jokes[self.rng.randrange(len(jokes))]
+                lines.append(f"{number}. Setup: {setup}\n   Punchline: {punchline}")
+            return '\n'.join(lines)
+
+        setup, punchline = jokes[self.rng.randrange(len(jokes))]
+        return f"{setup}\n{punchline}"
+
+    def _result(self, prompt, text):
+        self.messages.append({'role': 'user', 'content': [{'text': prompt}]})
+        self.messages.append({'role': 'assistant', 'content': [{'text': text}]})
+        # Rough token estimate; the history counts toward the prompt like Bedrock's
+        history = sum(len(message['content'][0]['text'].split()) for message in self.messages[:-1])
+        return MockResult(text, int(history * 1.3) + self.backend.system_tokens, int(len(text.split()) * 1.3))
+
+    def __call__(self, prompt):
+        latency, fails, text = self._plan(prompt)
+        time.sleep(latency)
+        if fails:
+            raise MockBackendError('ThrottlingException: mock backend injected failure')
+        return self._result(prompt, text)
+
+    async def invoke_async(self, prompt):
+        latency, fails, text = self._plan(prompt)
+        await asyncio.sleep(latency)
+        if fails:
+            raise MockBackendError('ThrottlingException: mock backend injected failure')
+        return self._result(prompt, text)
+
+    async def stream_async(self, prompt):
+        latency, fails, text = self._plan(prompt)
+        # First chunk after a third of the latency, the rest spread over the remainder
+        chunks = re.findall(r'\S+\s*', text)
+        await asyncio.sleep(latency / 3)
+        if fails:
+            raise MockBackendError('ThrottlingException: mock backend injected failure')
+        step = (latency * 2 / 3) / max(1, len(chunks))
+        for index, chunk in enumerate(chunks):
+            if index:
+                await asyncio.sleep(step)
+            yield {'data': chunk}
+        yield {'result': self._result(prompt, text)}
+
+
+class MockBackend(JokeBackend):
+    """Deterministic local backend with configurable latency and failures
+
+    JOKE_MOCK_LATENCY       latency distribution (see parse_latency), default fixed:0.05
+    JOKE_MOCK_FAILURE_RATE  fraction of calls that raise, default 0
+    JOKE_MOCK_SEED          seed for reproducible runs, default 42
+    """
+
+    name = 'mock'
+
+    def __init__(self, latency='fixed:0.05', failure_rate=0.0, seed=42, system_tokens=200):
+        self.sample_latency = parse_latency(latency)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.seed = seed
+        self.system_tokens = system_tokens
+        # Each agent gets its own seeded stream, so runs repeat exactly
+        self._agent_ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def create_agent(self):
+        with self._lock:
+            agent_id = next(self._agent_ids)
+        return MockAgent(self, seed=f"{self.seed}:{agent_id}")
+
+
+def create_backend(name, system_prompt, region=None, model=None, latency=None, failure_rate=None, seed=None):
+    """Build the backend selected by name ('bedrock' or 'mock')
+
+    region and model apply to Bedrock; latency, failure_rate and seed to the
+    mock, overriding the JOKE_MOCK_* settings.
+    """
+    name = (name or 'bedrock').lower()
+    if name == 'bedrock':
+        return BedrockBackend(system_prompt, region=region, model=model)
+    if name == 'mock':
+        return MockBackend(
+            latency=latency or os.environ.get('JOKE_MOCK_LATENCY', 'fixed:0.05'),
+            failure_rate=float(failure_rate if failure_rate is not None
+                               else os.environ.get('JOKE_MOCK_FAILURE_RATE', 0)),
+            seed=seed if seed is not None else os.environ.get('JOKE_MOCK_SEED', '42')
+        )
+    raise ValueError(f"Unknown JOKE_BACKEND: {name} (expected 'bedrock' or 'mock')")
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Pre-generated joke pool for the Kid's Joke Generator
+Keeps a few jokes ready per category so /api/joke doesn't wait on Bedrock
+"""
+
+import threading
+import time
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class JokePool:
+    """Bounded per-category joke pool refilled by background workers"""
+
+    def __init__(self, generate, categories, depth=8, low_water=3, workers=2, max_age=3600, batch=5):
+        # generate(category, count) -> list of joke texts (may return fewer, or raise)
+        self.generate = generate
+        self.depth = max(1, depth)
+        self.batch = max(1, batch)
+        self.low_water = min(max(0, low_water), self.depth)
+        self.max_age = max_age
+        self._jokes = {category: deque() for category in categories}
+        self._pending = {category: 0 for category in categories}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers),
+                                            thread_name_prefix='joke-pool')
+        self._closed = False
+
+    def get(self, category, skip=None):
+        """Pop a fresh joke for a category, or None if none is ready
+        
+        skip(joke) -> True passes over jokes this caller can't use; they stay
+        in the pool for someone else. When that leaves the caller fewer than
+        low_water usable jokes, the oldest skipped ones are evicted to make
+        room for a refill, so a full pool of already-seen jokes can't send a
+        session to the live model on every request.
+        """
+        joke = None
+        evicted = 0
+        with self._lock:
+            jokes = self._jokes.get(category)
+            if jokes is None:
+                return None
+            self._drop_stale(jokes)
+            skipped = []
+            usable = 0
+            for entry in jokes:
+                if skip is not None and skip(entry[1]):
+                    skipped.append(entry)
+                elif joke is None:
+                    joke = entry
+                else:
+                    usable += 1
+            if joke is not None:
+                jokes.remove(joke)
+                joke = joke[1]
+            if skipped and usable < self.low_water:
+                # Oldest first: they have had the longest to find another taker
+                for entry in skipped[:self.low_water - usable]:
+                    jokes.remove(entry)
+                    evicted += 1
+        self._schedule_refill(category, force=evicted > 0)
+        return joke
+
+    def put(self, category, joke):
+        """Add a joke to a category's pool (ignored when the pool is full)"""
+        with self._lock:
+            jokes = self._jokes.get(category)
+            if jokes is None or len(jokes) >= self.depth:
+                return False
+            jokes.append((time.monotonic(), joke))
+            return True
+
+    def fill_all(self):
+        """Start topping up every category in the background"""
+        for category in self._jokes:
+            self._schedule_refill(category, force=True)
+
+    def sizes(self):
+        """Current number of ready jokes per category"""
+        with self._lock:
+            return {category: len(jokes) for category, jokes in self._jokes.items()}
+
+    def shutdown(self):
+        """Stop accepting refill work"""
+        self._closed = True
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _drop_stale(self, jokes):
+        """Discard jokes older than max_age (caller holds the lock)"""
+        if not self.max_age:
+            return
+        cutoff = time.monotonic() - self.max_age
+        while jokes and jokes[0][0] < cutoff:
+            jokes.popleft()
+
+    def _schedule_refill(self, category, force=False):
+        """Queue refill jobs once a category drops below the low-water mark"""
+        if self._closed:
+            return
+        with self._lock:
+            jokes = self._jokes[category]
+            self._drop_stale(jokes)
+            available = len(jokes) + self._pending[category]
+            if not force and available >= self.low_water:
+                return
+            missing = max(0, self.depth - available)
+            self._pending[category] += missing
+        # Ask for several jokes per model call
+        while missing > 0:
+            count = min(self.batch, missing)
+            self._executor.submit(self._refill, category, count)
+            missing -= count
+
+    def _refill(self, category, count):
+        """Generate a batch of jokes and add them to the pool"""
+        try:
+            for joke in self.generate(category, count)[:count]:
+                if joke:
+                    self.put(category, joke)
+        except Exception as e:
+            logger.warning(f"Joke pool refill failed for {category}: {e}")
+        finally:
+            with self._lock:
+                self._pending[category] -= count
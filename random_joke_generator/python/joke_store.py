@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Persistent SQLite joke store for the Kid's Joke Generator
+Keeps every generated joke (deduplicated by normalized text) so the server
+can keep serving jokes when Bedrock is slow, rate-limited or down
+"""
+
+import os
+import re
+import time
+import queue
+import random
+import sqlite3
+import hashlib
+import logging
+import threading
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+# seq numbers a category's jokes 0, 1, 2, ... with no gaps (jokes are never
+# deleted), and categories.count is the next one, so a uniformly random joke
+# is two index lookups however big the table gets
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jokes (
+    id INTEGER PRIMARY KEY,
+    category TEXT NOT NULL,
+    joke TEXT NOT NULL,
+    hash TEXT NOT NULL UNIQUE,
+    created_at REAL NOT NULL,
+    seq INTEGER
+);
+CREATE TABLE IF NOT EXISTS categories (
+    category TEXT PRIMARY KEY,
+    count INTEGER NOT NULL
+);
+"""
+INDEXES = """
+CREATE UNIQUE INDEX IF NOT EXISTS jokes_category_seq ON jokes (category, seq);
+DROP INDEX IF EXISTS jokes_category_id;
+"""
+
+
+def joke_words(joke):
+    """The joke's words, normalized (case, punctuation, spacing and emoji ignored)"""
+    text = unicodedata.normalize('NFKD', joke).lower()
+    return re.findall(r'[a-z0-9]+', text)
+
+
+def joke_hash(joke):
+    """Hash of the joke's normalized text"""
+    return hashlib.sha1(' '.join(joke_words(joke)).encode('utf-8')).hexdigest()
+
+
+class JokeStore:
+    """SQLite-backed joke store with batched background writes"""
+
+    def __init__(self, path, batch_size=100, flush_interval=1.0):
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self._pending = queue.Queue()
+        self._local = threading.local()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        db = self._connection()
+        db.executescript(SCHEMA)
+        self._number_old_jokes(db)
+        db.executescript(INDEXES)
+        db.commit()
+
+        self._writer = threading.Thread(target=self._write_loop, name='joke-store-writer', daemon=True)
+        self._writer.start()
+
+    def add(self, category, joke):
+        """Queue a joke for saving; never blocks on the database"""
+        if joke:
+            self._pending.put((category, joke, joke_hash(joke), time.time()))
+
+    def sample(self, category):
+        """Return a random stored joke for a category, or None
+
+        Every joke in the category is equally likely: a random seq below the
+        category's count, looked up on the (category, seq) index.
+        """
+        db = self._connection()
+        row = db.execute('SELECT count FROM categories WHERE category = ?', (category,)).fetchone()
+        if not row or not row[0]:
+            return None
+        row = db.execute(
+            'SELECT joke FROM jokes WHERE category = ? AND seq = ?',
+            (category, random.randrange(row[0]))
+        ).fetchone()
+        return row[0] if row else None
+
+    def flush(self, timeout=5.0):
+        """Wait until queued jokes have been written"""
+        deadline = time.monotonic() + timeout
+        while self._pending.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def _connection(self):
+        """One connection per thread"""
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=10)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+        return db
+
+    def _number_old_jokes(self, db):
+        """One-time upgrade of a store from before seq: number its jokes and count them"""
+        if 'seq' in [column[1] for column in db.execute('PRAGMA table_info(jokes)')]:
+            return
+        with db:
+            db.execute('ALTER TABLE jokes ADD COLUMN seq INTEGER')
+            rows = db.execute('SELECT id, category FROM jokes ORDER BY category, id').fetchall()
+            counts = {}
+            numbered = []
+            for joke_id, category in rows:
+                numbered.append((counts.get(category, 0), joke_id))
+                counts[category] = counts.get(category, 0) + 1
+            db.executemany('UPDATE jokes SET seq = ? WHERE id = ?', numbered)
+            db.executemany('INSERT OR REPLACE INTO categories (category, count) VALUES (?, ?)',
+                           counts.items())
+        logger.info(f"Numbered {len(rows)} saved jokes for sampling")
+
+    def _write_loop(self):
+        """Collect queued jokes and write them in one transaction per batch"""
+        while True:
+            batch = [self._pending.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except Exception as e:
+                logger.error(f"Failed to save {len(batch)} jokes: {e}")
+            finally:
+                for _ in batch:
+                    self._pending.task_done()
+
+    def _write(self, batch):
+        db = self._connection()
+        counts = {}
+        with db:
+            # Takes the write lock first, so no other writer can hand out the same seq
+            db.execute('BEGIN IMMEDIATE')
+            for category, joke, digest, created_at in batch:
+                if category not in counts:
+                    row = db.execute('SELECT count FROM categories WHERE category = ?', (category,)).fetchone()
+                    counts[category] = row[0] if row else 0
+                cursor = db.execute(
+                    'INSERT OR IGNORE INTO jokes (category, joke, hash, created_at, seq) VALUES (?, ?, ?, ?, ?)',
+                    (category, joke, digest, created_at, counts[category])
+                )
+                if cursor.rowcount:
+                    counts[category] += 1
+            db.executemany('INSERT OR REPLACE INTO categories (category, count) VALUES (?, ?)',
+                           counts.items())
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Local joke generator for the Kid's Joke Generator
+Builds jokes in microseconds from per-category pun tables and a few
+phrasing templates, with no model call. Used as the hedge when Bedrock is
+slow: the answer is always ready, even if it is less fresh than the model's.
+"""
+
+import random
+
+# Phrasings for each kind of joke; {thing}, {did}, {pun}, {because}, {name}, {reply} come from the tables
+SETUPS = {
+    'call': ["What do you call {thing}?", "What's the name for {thing}?", "Do you know what you call {thing}?"],
+    'why': ["Why did {thing} {did}?", "What made {thing} {did}?"],
+    'knock': ["Knock knock! Who's there? {name}. {name} who?"]
+}
+PUNCHLINES = {
+    'call': ["{pun}!"],
+    'why': ["Because {because}!", "{Because}!"],
+    'knock': ["{reply}"]
+}
+
+PUN_TABLES = {
+    'general': [
+        ('call', {'thing': 'a sleeping bull', 'pun': 'A bulldozer'}),
+        ('call', {'thing': 'a snowman in summer', 'pun': 'A puddle'}),
+        ('call', {'thing': 'a belt made of watches', 'pun': 'A waist of time'}),
+        ('why', {'thing': 'the bicycle', 'did': 'fall over', 'because': "it was two-tired"}),
+        ('why', {'thing': 'the golfer', 'did': 'wear two pairs of pants', 'because': 'he got a hole in one'}),
+        ('why', {'thing': 'the picture', 'did': 'go to jail', 'because': 'it was framed'}),
+    ],
+    'animals': [
+        ('call', {'thing': 'a bear with no teeth', 'pun': 'A gummy bear'}),
+        ('call', {'thing': 'a dog magician', 'pun': 'A labracadabrador'}),
+        ('call', {'thing': 'an alligator in a vest', 'pun': 'An investigator'}),
+        ('call', {'thing': 'a pig that does karate', 'pun': 'A pork chop'}),
+        ('why', {'thing': 'the cow', 'did': 'wear a bell', 'because': "its horn didn't work"}),
+        ('why', {'thing': 'the owl', 'did': 'get invited to every party', 'because': 'it was a real hoot'}),
+        ('why', {'thing': 'the fish', 'did': 'swim in salt water', 'because': 'pepper made it sneeze'}),
+    ],
+    'food': [
+        ('call', {'thing': 'cheese that isn\'t yours', 'pun': 'Nacho cheese'}),
+        ('call', {'thing': 'a sad strawberry', 'pun': 'A blueberry'}),
+        ('call', {'thing': 'a fake noodle', 'pun': 'An impasta'}),
+        ('why', {'thing': 'the banana', 'did': 'go to the doctor', 'because': "it wasn't peeling well"}),
+        ('why', {'thing': 'the cookie', 'did': 'go to the nurse', 'because': 'it felt crummy'}),
+        ('why', {'thing': 'the tomato', 'did': 'turn red', 'because': 'it saw the salad dressing'}),
+        ('why', {'thing': 'the grape', 'did': 'stop in the middle of the road', 'because': 'it ran out of juice'}),
+    ],
+    'school': [
+        ('call', {'thing': 'a pencil with two erasers', 'pun': 'Pointless'}),
+        ('call', {'thing': 'a teacher who never says your name right', 'pun': 'Mister Take'}),
+        ('why', {'thing': 'the student', 'did': 'eat his homework', 'because': 'the teacher said it was a piece of cake'}),
+        ('why', {'thing': 'the music teacher', 'did': 'need a ladder', 'because': 'she had to reach the high notes'}),
+        ('why', {'thing': 'the math book', 'did': 'look so sad', 'because': 'it had too many problems'}),
+        ('why', {'thing': 'the clock', 'did': 'get sent to the principal', 'because': 'it tocked too much'}),
+    ],
+    'knock-knock': [
+        ('knock', {'name': 'Lettuce', 'reply': "Lettuce in, it's cold out here!"}),
+        ('knock', {'name': 'Boo', 'reply': "Don't cry, it's just a joke!"}),
+        ('knock', {'name': 'Olive', 'reply': 'Olive you and I miss you!'}),
+        ('knock', {'name': 'Interrupting cow', 'reply': 'MOO!'}),
+        ('knock', {'name': 'Cow says', 'reply': 'No silly, a cow says moo!'}),
+        ('knock', {'name': 'Tank', 'reply': "You're welcome!"}),
+    ],
+}
+
+
+class LocalJokeGenerator:
+    """Template and pun-table jokes, one category at a time"""
+
+    def __init__(self, tables=PUN_TABLES, seed=None):
+        self.tables = tables
+        self.rng = random.Random(seed)
+
+    def generate(self, category, skip=None, attempts=8):
+        """A joke for the category (setup and punchline on two lines), or None
+
+        skip(joke) -> True rejects a joke (already seen, blocked); up to
+        `attempts` combinations are tried.
+        """
+        table = self.tables.get(category) or self.tables['general']
+        for _ in range(attempts):
+            kind, words = self.rng.choice(table)
+            fields = dict(words)
+            if 'because' in fields:
+                fields['Because'] = fields['because'][:1].upper() + fields['because'][1:]
+            setup = self.rng.choice(SETUPS[kind]).format(**fields)
+            punchline = self.rng.choice(PUNCHLINES[kind]).format(**fields)
+            joke = f"{setup}\n{punchline}"
+            if skip is None or not skip(joke):
+                return joke
+        return None
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Latency-aware routing across model endpoints for the Kid's Joke Generator
+Holds one AgentPool per endpoint (a region or model ID) and offers the same
+checkout()/acheckout() interface as a single AgentPool. Each call goes to
+the better of two randomly chosen healthy endpoints, judged by an EWMA of
+latency and error rate. An endpoint that keeps failing is ejected by a
+circuit breaker until a probe call succeeds.
+"""
+
+import math
+import time
+import random
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager, asynccontextmanager
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+class Endpoint:
+    """One endpoint's agent pool plus its health statistics"""
+
+    def __init__(self, name, pool):
+        self.name = name
+        self.pool = pool
+        self.latency = None      # EWMA seconds; None until the first call finishes
+        self.error_rate = 0.0    # EWMA of failures (0..1), as of error_updated
+        self.error_updated = 0.0
+        self.inflight = 0
+        self.calls = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probing = False
+
+
+class EndpointRouter:
+    """Power-of-two-choices router over several agent pools, with circuit breakers"""
+
+    def __init__(self, endpoints, alpha=0.2, failure_threshold=5, error_threshold=0.5,
+                 cooldown=30.0, min_calls=10, error_penalty=10.0, error_decay=30.0):
+        # endpoints: [(name, AgentPool), ...]
+        # alpha: EWMA weight of the newest call; cooldown: seconds an open breaker waits for a probe
+        # error_penalty: seconds of latency one failed call is treated as costing
+        # error_decay: seconds for an idle endpoint's error rate to fade by a factor of e
+        self.endpoints = [Endpoint(name, pool) for name, pool in endpoints]
+        if not self.endpoints:
+            raise ValueError('EndpointRouter needs at least one endpoint')
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.error_threshold = error_threshold
+        self.cooldown = cooldown
+        self.min_calls = min_calls
+        self.error_penalty = error_penalty
+        self.error_decay = error_decay
+        self.size = sum(endpoint.pool.size for endpoint in self.endpoints)
+        self._lock = threading.Lock()
+        self._rng = random.Random()
+
+    def prime(self):
+        """Build one agent per endpoint; fails only when no endpoint works"""
+        errors = []
+        for endpoint in self.endpoints:
+            try:
+                endpoint.pool.prime()
+            except Exception as e:
+                errors.append(f"{endpoint.name}: {e}")
+                logger.error(f"Endpoint {endpoint.name} failed to start: {e}")
+                with self._lock:
+                    self._open(endpoint, time.monotonic())
+        if len(errors) == len(self.endpoints):
+            raise RuntimeError('; '.join(errors))
+
+    @contextmanager
+    def checkout(self, timeout=None):
+        """Borrow an agent from the best endpoint; the call's outcome updates its stats"""
+        endpoint = self._pick()
+        try:
+            with endpoint.pool.checkout(timeout) as agent:
+                started = time.monotonic()
+                try:
+                    yield agent
+                except Exception:
+                    self._record(endpoint, time.monotonic() - started, ok=False)
+                    raise
+                self._record(endpoint, time.monotonic() - started, ok=True)
+        finally:
+            self._leave(endpoint)
+
+    @asynccontextmanager
+    async def acheckout(self, timeout=None):
+        """Async checkout for the ASGI server"""
+        endpoint = self._pick()
+        try:
+            async with endpoint.pool.acheckout(timeout) as agent:
+                started = time.monotonic()
+                try:
+                    yield agent
+                except asyncio.CancelledError:
+                    # Lost hedge or gone client: not the endpoint's fault, but a
+                    # call this slow still says something about its latency
+                    self._record(endpoint, time.monotonic() - started, ok=None)
+                    raise
+                except Exception:
+                    self._record(endpoint, time.monotonic() - started, ok=False)
+                    raise
+                self._record(endpoint, time.monotonic() - started, ok=True)
+        finally:
+            self._leave(endpoint)
+
+    def stats(self):
+        """Per-endpoint state, latency and error EWMAs, and agent pool stats"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                endpoint.name: {
+                    'state': endpoint.state,
+                    'latency': endpoint.latency,
+                    'error_rate': self._errors(endpoint, now),
+                    'inflight': endpoint.inflight,
+                    'calls': endpoint.calls,
+                    'failures': endpoint.failures,
+                    'agents': endpoint.pool.stats()
+                }
+                for endpoint in self.endpoints
+            }
+
+    def _pick(self):
+        now = time.monotonic()
+        with self._lock:
+            candidates = [endpoint for endpoint in self.endpoints if self._available(endpoint, now)]
+            if not candidates:
+                # Everything is ejected: trying the least-recently opened beats failing outright
+                candidates = [min(self.endpoints, key=lambda endpoint: endpoint.opened_at)]
+            if len(candidates) == 1:
+                endpoint = candidates[0]
+            else:
+                first, second = self._rng.sample(candidates, 2)
+                endpoint = first if self._score(first, now) <= self._score(second, now) else second
+            if endpoint.state == HALF_OPEN:
+                endpoint.probing = True
+            endpoint.inflight += 1
+            return endpoint
+
+    def _available(self, endpoint, now):
+        # Caller holds the lock
+        if endpoint.state == OPEN and now - endpoint.opened_at >= self.cooldown:
+            endpoint.state = HALF_OPEN
+            endpoint.probing = False
+            logger.info(f"Endpoint {endpoint.name} half-open: sending a probe call")
+        if endpoint.state == HALF_OPEN:
+            # One probe at a time
+            return not endpoint.probing
+        return endpoint.state == CLOSED
+
+    def _score(self, endpoint, now):
+        # Expected cost of a call: latency plus the price of likely errors,
+        # scaled by work already queued. Endpoints never called score 0 so they get tried.
+        latency = endpoint.latency or 0.0
+        return (latency + self.error_penalty * self._errors(endpoint, now)) * (endpoint.inflight + 1)
+
+    def _errors(self, endpoint, now):
+        # Errors fade while an endpoint sits unused, so it gets another chance
+        return endpoint.error_rate * math.exp(-(now - endpoint.error_updated) / self.error_decay)
+
+    def _record(self, endpoint, elapsed, ok):
+        """Fold one call into the endpoint's EWMAs and breaker (ok=None: cancelled)"""
+        now = time.monotonic()
+        with self._lock:
+            if ok is None:
+                # Only a lower bound on the real latency: count it if it is bad news
+                if endpoint.latency is not None and elapsed > endpoint.latency:
+                    endpoint.latency += self.alpha * (elapsed - endpoint.latency)
+                return
+
+            endpoint.calls += 1
+            if ok and endpoint.latency is None:
+                endpoint.latency = elapsed
+            elif endpoint.latency is not None and (ok or elapsed > endpoint.latency):
+                # Fast failures must not make an endpoint look quick
+                endpoint.latency += self.alpha * (elapsed - endpoint.latency)
+            errors = self._errors(endpoint, now)
+            endpoint.error_rate = errors + self.alpha * ((0.0 if ok else 1.0) - errors)
+            endpoint.error_updated = now
+
+            if ok:
+                endpoint.consecutive_failures = 0
+                if endpoint.state == HALF_OPEN:
+                    endpoint.state = CLOSED
+                    endpoint.error_rate = 0.0
+                    endpoint.consecutive_failures = 0
+                    logger.warning(f"Endpoint {endpoint.name} recovered")
+                return
+
+            endpoint.failures += 1
+            endpoint.consecutive_failures += 1
+            if endpoint.state == HALF_OPEN:
+                self._open(endpoint, now)
+            elif (endpoint.consecutive_failures >= self.failure_threshold
+                  or (endpoint.calls >= self.min_calls and endpoint.error_rate >= self.error_threshold)):
+                self._open(endpoint, now)
+
+    def _open(self, endpoint, now):
+        # Caller holds the lock
+        endpoint.state = OPEN
+        endpoint.opened_at = now
+        endpoint.probing = False
+        logger.warning(f"Endpoint {endpoint.name} ejected for {self.cooldown:.0f}s "
+                       f"(error rate {endpoint.error_rate:.2f}, {endpoint.consecutive_failures} failures in a row)")
+
+    def _leave(self, endpoint):
+        with self._lock:
+            endpoint.inflight -= 1
+            if endpoint.state == HALF_OPEN:
+                # The probe ended without a verdict (no free agent, cancelled); allow another
+                endpoint.probing = False
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Output safety filter for the Kid's Joke Generator
+Checks model output against a blocklist compiled into an Aho-Corasick
+automaton, so one pass over the text finds every blocked word at once.
+Text is normalized first to undo leetspeak (sh1t, @ss), accents, and
+spacing tricks (s h i t, s.h.i.t). The word list is re-read when the file
+changes, without a restart.
+
+Blocklist format: one word or phrase per line, `#` starts a comment. Entries
+match whole words; a trailing `*` also matches longer words (`shit*`
+catches "shitty"). Loading warns about any entry that blocks one of the
+harmless SAFE_WORDS, so a new prefix can't quietly block "stable".
+"""
+
+import os
+import re
+import time
+import logging
+import threading
+import unicodedata
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+LEET = str.maketrans({
+    '0': 'o', '1': 'i', '3': 'e', '4': 'a', '5': 's', '7': 't',
+    '@': 'a', '$': 's', '!': 'i', '|': 'i', '+': 't'
+})
+
+# Harmless words and phrases a kid's joke might use that contain or start like a blocked word
+SAFE_WORDS = (
+    'stable', 'stables', 'booby', 'arsenal', 'arsenic', 'sextet', 'sextant',
+    'sexton', 'bloodhound', 'crappie', 'hello', 'shellfish', 'class', 'assemble',
+    'cocktail', 'dickens', 'gunpowder', 'deadline', 'killer whale', 'scunthorpe',
+    'root beer', 'root beer float',
+)
+
+# Words that are a single letter, so may stand in front of a spaced-out word
+ONE_LETTER_WORDS = ('a', 'i')
+
+
+def normalize(text):
+    """Lowercase words separated by single spaces, with common disguises undone
+
+    A spaced-out word right after a one-letter word ("a l o s e r") reads
+    either way, so the text then comes back in two forms joined by ' | ': the
+    run merged whole ("aloser") and with its first letter apart ("a loser").
+    An entry found in either form is found.
+    """
+    return ' | '.join(normal_forms(text))
+
+
+def normal_forms(text):
+    """normalize() as a list: one form, or two when a run of letters may start with a word"""
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    words = []
+    for token in text.split():
+        # Punctuation around a word is punctuation; inside it, it's a disguise
+        token = token.strip('.,;:?!"\'()[]{}<>-_*~')
+        token = re.sub(r'[^a-z0-9]', '', token.translate(LEET))
+        if token:
+            words.append(token)
+
+    # Runs of three or more single letters are one spaced-out word, perhaps
+    # after a real one-letter word ("a", "I")
+    merged = []
+    split = []
+    run = []
+    for word in words + ['']:
+        if len(word) == 1:
+            run.append(word)
+            continue
+        if len(run) >= 3:
+            merged.append(''.join(run))
+            split.extend([run[0], ''.join(run[1:])] if len(run) >= 4 and run[0] in ONE_LETTER_WORDS
+                         else [''.join(run)])
+        else:
+            merged.extend(run)
+            split.extend(run)
+        run = []
+        if word:
+            merged.append(word)
+            split.append(word)
+    forms = [' '.join(merged)]
+    if split != merged:
+        forms.append(' '.join(split))
+    return forms
+
+
+class Automaton:
+    """Aho-Corasick automaton over a fixed set of patterns"""
+
+    def __init__(self, patterns):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        for pattern in patterns:
+            node = 0
+            for ch in pattern:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                node = nxt
+            self._out[node] += (pattern,)
+
+        # Breadth-first: each node's failure link points at its longest proper suffix in the trie
+        pending = deque(self._goto[0].values())
+        while pending:
+            node = pending.popleft()
+            for ch, nxt in self._goto[node].items():
+                pending.append(nxt)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] += self._out[self._fail[nxt]]
+
+    def search(self, text):
+        """All patterns occurring in text (one pass, linear in its length)"""
+        goto, fail, out = self._goto, self._fail, self._out
+        found = []
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                found.extend(out[node])
+        return found
+
+
+def matched_entries(automaton, text):
+    """Blocklist entries an automaton finds in text"""
+    matches = automaton.search(' ' + normalize(text) + ' ')
+    # Patterns carry their word-boundary spaces; report the bare entries
+    return sorted({match.strip() + ('' if match.endswith(' ') else '*') for match in matches})
+
+
+class SafetyFilter:
+    """Blocklist filter that picks up edits to its word list on the fly"""
+
+    def __init__(self, path, reload_interval=1.0):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.words = ()
+        self.overblocked = {}    # harmless word -> entries that block it
+        self._automaton = Automaton(())
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.reload()
+
+    def blocked(self, text):
+        """Blocklist entries found in text (empty when the text is safe)"""
+        self._maybe_reload()
+        return matched_entries(self._automaton, text)
+
+    def is_safe(self, text):
+        return not self.blocked(text)
+
+    def reload(self):
+        """Re-read the blocklist file and swap in a freshly compiled automaton"""
+        with self._lock:
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+                with open(self.path, encoding='utf-8') as handle:
+                    lines = handle.read().splitlines()
+            except OSError as e:
+                if self._mtime is not None:
+                    logger.error(f"Keeping the old blocklist; can't read {self.path}: {e}")
+                    return False
+                raise
+            words = []
+            patterns = []
+            for line in lines:
+                entry = line.split('#', 1)[0].strip()
+                if not entry:
+                    continue
+                prefix = entry.endswith('*')
+                entry = normal_forms(entry.rstrip('*'))[0]
+                if not entry:
+                    continue
+                words.append(entry + ('*' if prefix else ''))
+                patterns.append(' ' + entry + ('' if prefix else ' '))
+            # Build first, then swap: checks running meanwhile use the old automaton
+            automaton = Automaton(patterns)
+            overblocked = {word: entries for word in SAFE_WORDS
+                           if (entries := matched_entries(automaton, word))}
+            for word, entries in overblocked.items():
+                logger.warning(f"Blocklist {', '.join(entries)} also blocks the harmless word '{word}'")
+            self._automaton = automaton
+            self.words = tuple(words)
+            self.overblocked = overblocked
+            self._mtime = mtime
+            logger.info(f"Loaded {len(words)} blocklist entries from {self.path}")
+            return True
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_interval:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return
+        if mtime != self._mtime:
+            self.reload()
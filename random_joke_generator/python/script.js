@@ -27,15 +27,82 @@ class JokeGenerator {
             const response = await fetch('/api/health');
             const data = await response.json();
             
-            if (!data.agent_initialized) {
+            if (data.status === 'warming') {
                 this.showError('Server is starting up. Please wait a moment and try again.');
+            } else if (data.status === 'degraded') {
+                this.showError('The joke robot is having a nap, so you\'ll get jokes it told before!');
             }
         } catch (error) {
             console.warn('Could not check server health:', error);
         }
     }
     
-    async generateJoke() {
+    generateJoke() {
+        // Stream when the browser can, so the setup shows up as soon as it's ready
+        if (window.EventSource) {
+            this.generateJokeStreaming();
+        } else {
+            this.generateJokeJson();
+        }
+    }
+    
+    generateJokeStreaming() {
+        const category = this.categorySelect.value;
+        
+        // Show loading state
+        this.showLoading();
+        this.generateButton.disabled = true;
+        
+        const source = new EventSource(`/api/joke/stream?category=${encodeURIComponent(category)}`);
+        let text = '';
+        let finished = false;
+        
+        const finish = () => {
+            finished = true;
+            source.close();
+            this.hideLoading();
+            this.generateButton.disabled = false;
+        };
+        
+        source.addEventListener('token', (event) => {
+            text += JSON.parse(event.data).text;
+            this.showPartialJoke(text);
+        });
+        
+        source.addEventListener('setup', (event) => {
+            // Pre-generated jokes arrive without tokens
+            if (!text) {
+                this.showPartialJoke(JSON.parse(event.data).text);
+            }
+        });
+        
+        source.addEventListener('done', (event) => {
+            finish();
+            this.displayJoke(JSON.parse(event.data).joke);
+        });
+        
+        source.addEventListener('joke-error', (event) => {
+            finish();
+            this.showError(JSON.parse(event.data).error || 'Sorry, I couldn\'t think of a joke right now!');
+        });
+        
+        source.onerror = () => {
+            if (finished) {
+                return;
+            }
+            if (text) {
+                finish();
+                this.showError('Oops! The joke got cut off. Try again!');
+            } else {
+                // Streaming isn't available, so fall back to the JSON endpoint
+                finished = true;
+                source.close();
+                this.generateJokeJson();
+            }
+        };
+    }
+    
+    async generateJokeJson() {
         const category = this.categorySelect.value;
         
         // Show loading state
@@ -87,6 +154,11 @@ class JokeGenerator {
         this.addJokeEmojis();
     }
     
+    showPartialJoke(text) {
+        this.hideLoading();
+        this.jokeDisplay.innerHTML = `<p>${this.formatJoke(text)}</p>`;
+    }
+    
     formatJoke(joke) {
         // Remove any markdown formatting
         let formatted = joke.replace(/\*\*(.*?)\*\*/g, '$1');
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Per-session repeat detection for the Kid's Joke Generator
+Remembers the jokes each session has been shown as compact MinHash
+signatures with an LSH band index, so "have they heard this one, or a
+rewording of it?" is a handful of dict lookups even after thousands of jokes
+"""
+
+import time
+import random
+import hashlib
+import threading
+from collections import OrderedDict, deque
+
+from joke_store import joke_words
+
+# Words every joke shares; left out so "What do you call a..." jokes don't look alike
+STOP_WORDS = frozenset("""
+    a an and are as at be because but by call can did do does for from get go had has
+    have he her his how i if in is it its knock me my no not of on or s she so t that
+    the their them there they this to too was we what when where which who why will
+    with you your
+""".split())
+
+# Mersenne prime for the universal hash family (a * x + b) mod P
+_PRIME = (1 << 61) - 1
+
+
+class MinHasher:
+    """MinHash signatures over word shingles, split into LSH bands"""
+
+    def __init__(self, num_perm=32, bands=16, shingle=2, seed=1):
+        if num_perm % bands:
+            raise ValueError('num_perm must be a multiple of bands')
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle = shingle
+        rng = random.Random(seed)
+        self._perms = [(rng.randrange(1, _PRIME), rng.randrange(_PRIME)) for _ in range(num_perm)]
+
+    def shingles(self, joke):
+        """Hashed runs of 1 to `shingle` consecutive normalized, non-stop words"""
+        words = [word for word in joke_words(joke) if word not in STOP_WORDS] or ['']
+        # Single words catch rewordings; longer runs keep word order meaningful
+        grams = {' '.join(words[i:i + size])
+                 for size in range(1, self.shingle + 1)
+                 for i in range(max(1, len(words) - size + 1))}
+        return [int.from_bytes(hashlib.blake2b(gram.encode('utf-8'), digest_size=8).digest(), 'big')
+                for gram in grams]
+
+    def signature(self, joke):
+        """One minimum per hash function"""
+        values = self.shingles(joke)
+        return [min((a * x + b) % _PRIME for x in values) for a, b in self._perms]
+
+    def band_keys(self, signature):
+        """One key per band; jokes sharing any key are candidate near-duplicates"""
+        rows = self.rows
+        return tuple(hash((band,) + tuple(signature[band * rows:(band + 1) * rows]))
+                     for band in range(self.bands))
+
+
+def fingerprint(signature):
+    """Low byte of each minimum (b-bit MinHash): 1 byte per hash function"""
+    return bytes(value & 0xff for value in signature)
+
+
+def similarity(first, second):
+    """Estimated Jaccard similarity of two fingerprints"""
+    matches = sum(1 for a, b in zip(first, second) if a == b) / len(first)
+    # Unrelated jokes still agree on 1 byte in 256 by chance
+    return max(0.0, (matches - 1 / 256) / (1 - 1 / 256))
+
+
+class _Session:
+    def __init__(self):
+        self.last_used = time.monotonic()
+        self.next_id = 0
+        self.jokes = {}        # joke id -> (band keys, fingerprint)
+        self.order = deque()   # joke ids, oldest first
+        self.index = {}        # band key -> newest joke id with that band
+
+
+class SeenJokes:
+    """Bounded per-session memory of served jokes with near-duplicate lookup"""
+
+    def __init__(self, threshold=0.4, max_jokes=1000, max_sessions=5000, ttl=1800,
+                 num_perm=32, bands=16):
+        # threshold: estimated word-pair overlap at which two jokes count as the same
+        self.threshold = threshold
+        self.max_jokes = max(1, max_jokes)
+        self.max_sessions = max(1, max_sessions)
+        self.ttl = ttl
+        self.hasher = MinHasher(num_perm=num_perm, bands=bands)
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def seen(self, session, joke):
+        """True if this session was already shown this joke or a near-duplicate"""
+        keys, fp = self._digest(joke)
+        with self._lock:
+            state = self._session(session, create=False)
+            if state is None:
+                return False
+            for key in keys:
+                joke_id = state.index.get(key)
+                entry = state.jokes.get(joke_id)
+                if entry is not None and similarity(fp, entry[1]) >= self.threshold:
+                    return True
+            return False
+
+    def add(self, session, joke):
+        """Remember that this session was shown a joke"""
+        keys, fp = self._digest(joke)
+        with self._lock:
+            state = self._session(session, create=True)
+            joke_id = state.next_id
+            state.next_id += 1
+            state.jokes[joke_id] = (keys, fp)
+            state.order.append(joke_id)
+            for key in keys:
+                state.index[key] = joke_id
+            if len(state.order) > self.max_jokes:
+                oldest = state.order.popleft()
+                for key in state.jokes.pop(oldest)[0]:
+                    if state.index.get(key) == oldest:
+                        del state.index[key]
+
+    def stats(self):
+        """Number of tracked sessions and remembered jokes"""
+        with self._lock:
+            self._expire()
+            return {
+                'sessions': len(self._sessions),
+                'jokes': sum(len(state.order) for state in self._sessions.values())
+            }
+
+    def _digest(self, joke):
+        signature = self.hasher.signature(joke)
+        return self.hasher.band_keys(signature), fingerprint(signature)
+
+    def _session(self, session, create):
+        # Caller holds the lock
+        self._expire()
+        state = self._sessions.get(session)
+        if state is None:
+            if not create:
+                return None
+            state = self._sessions[session] = _Session()
+            if len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        else:
+            self._sessions.move_to_end(session)
+        state.last_used = time.monotonic()
+        return state
+
+    def _expire(self):
+        # Caller holds the lock; sessions are kept least recently used first
+        cutoff = time.monotonic() - self.ttl
+        while self._sessions:
+            state = next(iter(self._sessions.values()))
+            if state.last_used >= cutoff:
+                break
+            self._sessions.popitem(last=False)
@@ -3,11 +3,33 @@
 Kid-friendly joke generator server using Amazon Bedrock with Anthropic models
 """
 
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, send_from_directory, Response, stream_with_context, g
 from flask_cors import CORS
 import os
 import sys
+import re
+import posixpath
+import json
+import queue
+import time
+import asyncio
+import secrets
 import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import metrics
+from admission import AdmissionController, Overloaded
+from agent_pool import AgentPool
+from backends import create_backend
+from router import EndpointRouter
+from joke_pool import JokePool
+from joke_store import JokeStore
+from local_jokes import LocalJokeGenerator
+from safety_filter import SafetyFilter
+from seen_jokes import SeenJokes
 
 # Configure logging
 logging.basicConfig(level=logging.WARNING)
@@ -18,18 +40,153 @@ logging.getLogger('strands').setLevel(logging.WARNING)
 app = Flask(__name__)
 CORS(app)
 
-# Initialize the agent
-agent = None
+# Serving mode: 'flask' (threaded dev server) or 'asgi' (async, see asgi_server.py)
+SERVER_MODE = os.environ.get('JOKE_SERVER_MODE', 'flask').lower()
 
-def initialize_agent():
-    """Initialize the Strands agent with Bedrock"""
-    global agent
-    try:
-        from strands import Agent
-        
-        # Create agent with kid-friendly system prompt
-        agent = Agent(
-            system_prompt="""You are a kid-friendly joke generator. Your job is to create clean, 
+# Agent pool: each call borrows its own agent, so threads never share one
+AGENT_POOL_SIZE = int(os.environ.get('JOKE_AGENT_POOL_SIZE', 4))          # max concurrent Bedrock calls
+AGENT_HISTORY_LIMIT = int(os.environ.get('JOKE_AGENT_HISTORY_LIMIT', 0))  # messages kept between calls
+AGENT_WAIT_TIMEOUT = float(os.environ.get('JOKE_AGENT_WAIT_TIMEOUT', 30)) # seconds to wait for a free agent
+agent_pool = None
+
+# Admission control: rate limits plus a bounded queue for live model calls
+admission = AdmissionController(
+    client_rate=float(os.environ.get('JOKE_RATE_PER_CLIENT', 1)),    # requests/second per session (0 = off)
+    client_burst=float(os.environ.get('JOKE_BURST_PER_CLIENT', 5)),  # short bursts a client may make
+    global_rate=float(os.environ.get('JOKE_RATE_GLOBAL', 20)),       # requests/second overall (0 = off)
+    global_burst=float(os.environ.get('JOKE_BURST_GLOBAL', 40)),
+    max_concurrent=int(os.environ.get('JOKE_MAX_CONCURRENT', AGENT_POOL_SIZE)),  # live calls at once
+    max_queue=int(os.environ.get('JOKE_QUEUE_MAX', 16)),             # requests waiting for a live call
+    queue_timeout=float(os.environ.get('JOKE_QUEUE_TIMEOUT', 5))     # seconds a request may wait
+)
+
+# Hedged requests: if the model hasn't answered /api/joke within the hedge
+# delay, a local pun-table joke answers instead (JOKE_HEDGE_DELAY=0 turns hedging off)
+LATENCY_BUDGET = float(os.environ.get('JOKE_LATENCY_BUDGET', 8))  # default (and longest) wait per request, seconds
+# How long the model gets before the local joke: seconds, or 'auto' for the p95 of recent model calls
+HEDGE_SETTING = os.environ.get('JOKE_HEDGE_DELAY', 'auto')
+HEDGE_DELAY = None if HEDGE_SETTING == 'auto' else float(HEDGE_SETTING)
+HEDGE_INITIAL = 5.0       # auto delay until HEDGE_MIN_SAMPLES calls are in (the slow end of Bedrock's 3-5s)
+HEDGE_MIN_SAMPLES = 20
+HEDGE_FLOOR = 0.5         # never hedge sooner than this, however fast the model has been
+model_latencies = deque(maxlen=200)  # recent successful single-joke call durations
+model_latencies_lock = threading.Lock()
+local_jokes = LocalJokeGenerator()
+# Live calls run here so the request thread can stop waiting on them. Each one
+# reserves its admission place before it is submitted, so there are never more
+# of them than max_concurrent + max_queue and none waits unseen in this pool
+hedge_executor = ThreadPoolExecutor(max_workers=admission.max_concurrent + admission.max_queue,
+                                    thread_name_prefix='joke-hedge')
+
+# Metrics served at /metrics
+MODEL_LATENCY = metrics.Histogram('joke_model_call_seconds', 'Duration of model calls',
+                                  ('category', 'kind'))
+PROMPT_TOKENS = metrics.Histogram('joke_prompt_tokens', 'Prompt (input) tokens per model call',
+                                  ('category', 'kind'), buckets=metrics.TOKEN_BUCKETS)
+COMPLETION_TOKENS = metrics.Histogram('joke_completion_tokens', 'Completion (output) tokens per model call',
+                                      ('category', 'kind'), buckets=metrics.TOKEN_BUCKETS)
+MODEL_ERRORS = metrics.Counter('joke_model_errors_total', 'Failed model calls by exception type',
+                               ('category', 'kind', 'error'))
+JOKES_SERVED = metrics.Counter('joke_served_total', 'Jokes served by where they came from',
+                               ('endpoint', 'category', 'source'))
+FALLBACKS = metrics.Counter('joke_fallback_total', 'Fallback jokes served instead of a model joke',
+                            ('category', 'reason'))
+REPEATS = metrics.Counter('joke_repeats_total', 'Jokes the session had already seen (retried or served anyway)',
+                          ('category', 'action'))
+BLOCKED = metrics.Counter('joke_blocked_total', 'Jokes stopped by the safety filter', ('category', 'source'))
+SAFETY_LATENCY = metrics.Histogram('joke_safety_check_seconds', 'Time spent in the safety filter per check',
+                                   buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.01))
+HEDGES = metrics.Counter('joke_hedges_total', 'Requests where the model missed the hedge delay', ('category',))
+HEDGE_WINS = metrics.Counter('joke_hedge_wins_total', 'Which path answered a hedged /api/joke request',
+                             ('category', 'winner'))
+REQUEST_LATENCY = metrics.Histogram('joke_request_seconds', 'Time from request to response headers',
+                                    ('endpoint', 'status'))
+
+metrics.Gauge('joke_pool_ready', 'Pre-generated jokes ready per category', ('category',),
+              collect=lambda: {(category,): size for category, size in (joke_pool.sizes() if joke_pool else {}).items()})
+metrics.Gauge('joke_endpoint_up', 'Routed model endpoints in service (0 while ejected)', ('endpoint',),
+              collect=lambda: {(name,): int(stats['state'] == 'closed') for name, stats in endpoint_stats().items()})
+metrics.Gauge('joke_endpoint_latency_seconds', 'EWMA call latency per routed model endpoint', ('endpoint',),
+              collect=lambda: {(name,): stats['latency'] or 0 for name, stats in endpoint_stats().items()})
+metrics.Gauge('joke_endpoint_error_rate', 'EWMA error rate per routed model endpoint', ('endpoint',),
+              collect=lambda: {(name,): stats['error_rate'] for name, stats in endpoint_stats().items()})
+metrics.Gauge('joke_admission_queue_depth', 'Requests waiting for a live model call',
+              collect=lambda: {(): admission.stats()['queue_depth']})
+metrics.Gauge('joke_hedge_delay_seconds', 'Current hedge delay for /api/joke',
+              collect=lambda: {(): hedge_delay()})
+metrics.Gauge('joke_admission_active', 'Live model calls in flight',
+              collect=lambda: {(): admission.stats()['active']})
+metrics.Counter('joke_admission_rejected_total', 'Requests shed by admission control', ('reason',),
+                collect=lambda: {(reason,): count for reason, count in admission.stats()['rejected'].items()})
+metrics.Gauge('joke_admission_wait_seconds', 'Recent queue wait before a live model call', ('quantile',),
+              collect=lambda: {(name,): value for name, value in admission.stats()['wait_seconds'].items()})
+
+# Agent warm-up runs in the background so the port is bound right away
+# States: 'warming' (first attempt running), 'ready', 'degraded' (retrying)
+WARMUP_RETRY_MAX = float(os.environ.get('JOKE_WARMUP_RETRY_MAX', 60))  # longest wait between retries
+WARMUP_RETRY_AFTER = 5  # Retry-After, in seconds, when warm-up leaves nothing to serve
+agent_state = 'warming'
+agent_error = None
+
+# Pre-generated joke pool (override sizes with environment variables)
+POOL_DEPTH = int(os.environ.get('JOKE_POOL_DEPTH', 8))          # jokes kept per category
+POOL_LOW_WATER = int(os.environ.get('JOKE_POOL_LOW_WATER', 3))  # refill below this many
+POOL_WORKERS = int(os.environ.get('JOKE_POOL_WORKERS', 2))      # concurrent refill calls
+POOL_MAX_AGE = int(os.environ.get('JOKE_POOL_MAX_AGE', 3600))   # seconds before a joke is stale
+POOL_BATCH = int(os.environ.get('JOKE_POOL_BATCH', 5))          # jokes requested per refill call
+joke_pool = None
+
+# Map categories to kid-friendly prompts
+CATEGORY_PROMPTS = {
+    'general': 'Generate a funny, clean joke for kids about anything fun and silly.',
+    'animals': 'Generate a funny, clean joke for kids about animals.',
+    'food': 'Generate a funny, clean joke for kids about food.',
+    'school': 'Generate a funny, clean joke for kids about school.',
+    'knock-knock': 'Generate a knock-knock joke that kids will love.'
+}
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Server state; the static routes never serve anything under it
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+# The only file types the static routes serve (not .py, .txt, databases, ...)
+WEB_SUFFIXES = ('.html', '.css', '.js', '.png', '.jpg', '.jpeg', '.gif', '.svg', '.ico', '.webp', '.woff2')
+
+# Every generated joke is saved here and served when Bedrock is unavailable
+# (set JOKE_STORE_PATH to an empty string to turn the store off)
+DEFAULT_STORE_PATH = os.path.join(DATA_DIR, 'jokes.db')
+STORE_PATH = os.environ.get('JOKE_STORE_PATH', DEFAULT_STORE_PATH)
+joke_store = None
+
+# Every joke is checked against this blocklist before it is served
+# (edits are picked up without a restart; set JOKE_BLOCKLIST_PATH to an empty string to turn it off)
+BLOCKLIST_PATH = os.environ.get('JOKE_BLOCKLIST_PATH', os.path.join(DATA_DIR, 'blocklist.txt'))
+SAFETY_RETRIES = int(os.environ.get('JOKE_SAFETY_RETRIES', 1))  # extra model calls after a blocked joke
+safety_filter = None
+
+# Per-session repeat detection: each browser gets a session cookie, and
+# /api/joke avoids jokes (or rewordings of jokes) that session has seen
+# (set JOKE_DEDUPE=0 to turn it off)
+SESSION_COOKIE = 'joke_session'
+DEDUPE_RETRIES = int(os.environ.get('JOKE_DEDUPE_RETRIES', 3))  # extra model calls for an unseen joke
+seen_jokes = SeenJokes(
+    threshold=float(os.environ.get('JOKE_DEDUPE_THRESHOLD', 0.4)),  # similarity that counts as a repeat
+    max_jokes=int(os.environ.get('JOKE_SESSION_MAX_JOKES', 1000)),  # jokes remembered per session
+    max_sessions=int(os.environ.get('JOKE_SESSION_MAX', 5000)),     # sessions remembered at once
+    ttl=float(os.environ.get('JOKE_SESSION_TTL', 1800))             # idle seconds before a session is forgotten
+) if os.environ.get('JOKE_DEDUPE', '1') != '0' else None
+
+# Batch requests ask for several jokes in one model call
+BATCH_MAX = int(os.environ.get('JOKE_BATCH_MAX', 20))
+BATCH_PROMPT = """{prompt}
+
+This time write {count} different jokes instead of one. Number them and
+format each one exactly like this, with nothing else before or after:
+1. Setup: <setup line>
+   Punchline: <punchline>"""
+
+FALLBACK_JOKE = "Why don't scientists trust atoms? Because they make up everything! 😄"
+
+SYSTEM_PROMPT = """You are a kid-friendly joke generator. Your job is to create clean, 
             appropriate, and funny jokes for children aged 5-12. Follow these rules:
             
             1. Keep jokes completely clean and appropriate for kids
@@ -47,65 +204,701 @@ def initialize_agent():
             - Why did the banana go to the doctor? It wasn't peeling well!
             
             Generate ONE joke at a time based on the requested category."""
-        )
-        logger.info("Agent initialized successfully with Bedrock")
+
+# Joke backend: 'bedrock' (Strands agent) or 'mock' (offline, for load tests)
+BACKEND_NAME = os.environ.get('JOKE_BACKEND', 'bedrock')
+backend = create_backend(BACKEND_NAME, SYSTEM_PROMPT)
+
+# Several model endpoints behind a latency-aware router, as a JSON list, e.g.
+#   [{"name": "east", "region": "us-east-1"}, {"name": "west", "region": "us-west-2"}]
+# Entries may also set "model", "backend", and the mock's "latency"/"failure_rate"/"seed".
+# Empty means one endpoint from JOKE_BACKEND.
+ENDPOINTS = json.loads(os.environ.get('JOKE_ENDPOINTS') or '[]')
+ENDPOINT_FAILURES = int(os.environ.get('JOKE_ENDPOINT_FAILURES', 5))       # failures in a row that eject an endpoint
+ENDPOINT_COOLDOWN = float(os.environ.get('JOKE_ENDPOINT_COOLDOWN', 30))    # seconds before an ejected endpoint is probed
+
+def build_agent():
+    """Create one agent from the configured backend"""
+    return backend.create_agent()
+
+def build_agent_pool():
+    """One agent pool, or a router over one pool per configured endpoint"""
+    if not ENDPOINTS:
+        return AgentPool(build_agent, size=AGENT_POOL_SIZE, history_limit=AGENT_HISTORY_LIMIT)
+    endpoints = []
+    for number, spec in enumerate(ENDPOINTS, 1):
+        options = {key: spec[key] for key in ('region', 'model', 'latency', 'failure_rate', 'seed') if key in spec}
+        endpoint_backend = create_backend(spec.get('backend', BACKEND_NAME), SYSTEM_PROMPT, **options)
+        name = spec.get('name') or spec.get('region') or f'endpoint-{number}'
+        pool = AgentPool(endpoint_backend.create_agent, size=AGENT_POOL_SIZE, history_limit=AGENT_HISTORY_LIMIT)
+        endpoints.append((name, pool))
+    return EndpointRouter(endpoints, failure_threshold=ENDPOINT_FAILURES, cooldown=ENDPOINT_COOLDOWN)
+
+def endpoint_stats():
+    """Per-endpoint router stats (empty with a single endpoint)"""
+    return agent_pool.stats() if isinstance(agent_pool, EndpointRouter) else {}
+
+def initialize_agent():
+    """Initialize the pool of agents from the configured backend"""
+    global agent_pool, agent_error
+    try:
+        pool = build_agent_pool()
+        # Build the first agent now so credential problems show up at startup
+        pool.prime()
+        # One priming call warms the model connection before real traffic;
+        # its joke goes to the store rather than being thrown away. With
+        # several endpoints, one that fails is skipped by the router.
+        for attempt in range(max(1, len(ENDPOINTS))):
+            try:
+                with pool.checkout(timeout=AGENT_WAIT_TIMEOUT) as agent:
+                    with model_call('general', 'prime'):
+                        response = agent(CATEGORY_PROMPTS['general'])
+                break
+            except Exception:
+                if attempt + 1 >= max(1, len(ENDPOINTS)):
+                    raise
+        record_usage('general', 'prime', response)
+        joke = response_text(response)
+        if check_safe('general', joke, 'prime'):
+            save_jokes('general', [joke])
+        agent_pool = pool
+        agent_error = None
+        logger.info(f"Agent pool initialized successfully ({len(ENDPOINTS) or 1} endpoint(s))")
         return True
     except Exception as e:
+        agent_error = str(e)
         logger.error(f"Failed to initialize agent: {e}")
         return False
 
+def warm_up_agent():
+    """Initialize the agent and joke pool, retrying with backoff until it works"""
+    global agent_state
+    delay = 1.0
+    while not initialize_agent():
+        # Keep serving (saved jokes, static files) while we retry
+        agent_state = 'degraded'
+        print(f"⚠️  Agent not ready, retrying in {delay:.0f}s: {agent_error}")
+        time.sleep(delay)
+        delay = min(delay * 2, WARMUP_RETRY_MAX)
+    agent_state = 'ready'
+    print("✅ Agent initialized successfully!")
+    initialize_pool()
+    print(f"🎒 Joke pool filling in the background ({POOL_DEPTH} per category)")
+
+def start_warmup():
+    """Warm the agent up on a background thread"""
+    threading.Thread(target=warm_up_agent, name='agent-warmup', daemon=True).start()
+
+def ask_agent(category):
+    """Ask the agent for one joke in a category (blocking Bedrock call)
+    
+    A joke the safety filter blocks is asked for again, up to
+    SAFETY_RETRIES times, before giving up with UnsafeJoke.
+    """
+    prompt = CATEGORY_PROMPTS.get(category, CATEGORY_PROMPTS['general'])
+    
+    for _ in range(SAFETY_RETRIES + 1):
+        with agent_pool.checkout(timeout=AGENT_WAIT_TIMEOUT) as agent:
+            with model_call(category, 'single'):
+                response = agent(prompt)
+        record_usage(category, 'single', response)
+        
+        joke = response_text(response)
+        if check_safe(category, joke, 'live'):
+            save_jokes(category, [joke])
+            return joke
+    raise UnsafeJoke(category)
+
+class UnsafeJoke(Exception):
+    """The model kept writing jokes the safety filter blocks"""
+
+def check_safe(category, joke, source):
+    """True if the joke passes the safety filter; blocked jokes are counted and logged"""
+    if safety_filter is None or not joke:
+        return True
+    started = time.perf_counter()
+    blocked = safety_filter.blocked(joke)
+    SAFETY_LATENCY.observe(time.perf_counter() - started)
+    if blocked:
+        BLOCKED.inc(category=category, source=source)
+        logger.warning(f"Blocked a {source} joke for {category}: {', '.join(blocked)}")
+        return False
+    return True
+
+def safe_replacement(category, skip=None):
+    """(joke, source) standing in for a blocked joke: a saved one, else the built-in joke"""
+    joke = stored_fallback(category, 'unsafe', skip)
+    if joke is not None:
+        return joke, 'store'
+    FALLBACKS.inc(category=category, reason='unsafe')
+    return FALLBACK_JOKE, 'fallback'
+
+@contextmanager
+def model_call(category, kind):
+    """Time one model call and count its failures by exception type"""
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        MODEL_ERRORS.inc(category=category, kind=kind, error=type(e).__name__)
+        raise
+    else:
+        if kind == 'single':
+            with model_latencies_lock:
+                model_latencies.append(time.perf_counter() - started)
+    finally:
+        MODEL_LATENCY.observe(time.perf_counter() - started, category=category, kind=kind)
+
+def hedge_delay():
+    """Seconds the model gets before the local joke (0 = no hedging)
+    
+    JOKE_HEDGE_DELAY when it is a number; otherwise the p95 of recent
+    single-joke calls, so most jokes still come from the model however fast
+    or slow the endpoint is today.
+    """
+    if HEDGE_DELAY is not None:
+        return HEDGE_DELAY
+    with model_latencies_lock:
+        samples = sorted(model_latencies)
+    if len(samples) < HEDGE_MIN_SAMPLES:
+        return HEDGE_INITIAL
+    return max(HEDGE_FLOOR, samples[int(len(samples) * 0.95)])
+
+def record_usage(category, kind, response):
+    """Record prompt/completion token counts from an AgentResult, if it has them"""
+    usage = getattr(getattr(response, 'metrics', None), 'accumulated_usage', None)
+    if not usage:
+        return
+    if 'inputTokens' in usage:
+        PROMPT_TOKENS.observe(usage['inputTokens'], category=category, kind=kind)
+    if 'outputTokens' in usage:
+        COMPLETION_TOKENS.observe(usage['outputTokens'], category=category, kind=kind)
+
+def response_text(response):
+    """Text of an agent reply"""
+    # Handle the response properly (it's an AgentResult object)
+    if hasattr(response, 'content'):
+        return response.content.strip()
+    return str(response).strip()
+
+def ask_agent_batch(category, count):
+    """Ask the agent for several jokes in one call; returns joke records"""
+    prompt = BATCH_PROMPT.format(
+        prompt=CATEGORY_PROMPTS.get(category, CATEGORY_PROMPTS['general']),
+        count=count
+    )
+    
+    with agent_pool.checkout(timeout=AGENT_WAIT_TIMEOUT) as agent:
+        with model_call(category, 'batch'):
+            response = agent(prompt)
+    record_usage(category, 'batch', response)
+    
+    records = [record for record in parse_jokes(response_text(response))[:count]
+               if check_safe(category, record['joke'], 'batch')]
+    save_jokes(category, [record['joke'] for record in records])
+    return records
+
+def hedged_joke(category, skip, budget):
+    """(joke, source) from the model, or from the local generator if the model is slow
+    
+    The model gets hedge_delay() seconds (at most half the budget). After that an
+    acceptable local joke wins; if there is none, the model gets the rest of the
+    budget. Threads can't be interrupted, so a losing call still queued for a
+    slot is dropped, and one already running finishes in the background with
+    its joke going into the joke pool.
+    """
+    abandoned = threading.Event()
+    # In line (and in queue_depth) from now, not from when a pool thread picks it up
+    reserved_at = admission.reserve()
+    
+    def live():
+        with admission.slot(reserved_at):
+            if abandoned.is_set():
+                return None
+            return ask_agent_unseen(category, skip)
+    
+    started = time.monotonic()
+    future = hedge_executor.submit(live)
+    delay = hedge_delay()
+    hedge = min(delay, budget / 2) if delay > 0 else budget
+    try:
+        joke = future.result(timeout=hedge)
+        HEDGE_WINS.inc(category=category, winner='model')
+        return joke, 'live'
+    except FutureTimeout:
+        pass
+    
+    if delay > 0:
+        HEDGES.inc(category=category)
+        joke = local_joke(category, skip)
+        if joke is not None:
+            HEDGE_WINS.inc(category=category, winner='local')
+            abandoned.set()
+            future.add_done_callback(lambda done: bank_late_joke(category, done))
+            return joke, 'local'
+    
+    try:
+        joke = future.result(timeout=max(0, budget - (time.monotonic() - started)))
+    except FutureTimeout:
+        abandoned.set()
+        future.add_done_callback(lambda done: bank_late_joke(category, done))
+        raise TimeoutError(f"No joke within the {budget:.1f}s budget")
+    HEDGE_WINS.inc(category=category, winner='model')
+    return joke, 'live'
+
+def local_joke(category, skip=None):
+    """A local pun-table joke that passes the safety filter and skip, or None"""
+    return local_jokes.generate(category, lambda joke: bool(skip and skip(joke))
+                                or not check_safe(category, joke, 'local'))
+
+def bank_late_joke(category, future):
+    """Keep a model joke that lost the race for the next request"""
+    if future.cancelled() or future.exception() is not None:
+        return
+    if joke_pool and future.result():
+        joke_pool.put(category, future.result())
+
+def request_budget(data):
+    """Seconds this request may wait for a joke: budget_ms if given, capped at LATENCY_BUDGET"""
+    try:
+        budget = float(data.get('budget_ms')) / 1000
+    except (TypeError, ValueError):
+        return LATENCY_BUDGET
+    return min(max(budget, 0.05), LATENCY_BUDGET)
+
+def ask_agent_unseen(category, skip):
+    """ask_agent, asking again while the joke is one this session has seen"""
+    joke = ask_agent(category)
+    for _ in range(DEDUPE_RETRIES):
+        if not skip or not skip(joke):
+            return joke
+        REPEATS.inc(category=category, action='retry')
+        joke = ask_agent(category)
+    return unseen_or_repeat(category, joke, skip)
+
+def unseen_or_repeat(category, joke, skip):
+    """A saved joke the session hasn't seen in place of a repeat; else the repeat itself"""
+    if not skip or not skip(joke):
+        return joke
+    replacement = next(iter(stored_jokes(category, skip=skip)), None)
+    if replacement is not None:
+        return replacement
+    REPEATS.inc(category=category, action='served')
+    return joke
+
+def rate_key(cookies, address):
+    """Per-client rate-limit key: the browser's session cookie, else its address
+    
+    Browsers behind one NAT (a classroom, a school proxy) share an address, so
+    each gets its own bucket through its session; the global bucket still caps
+    the total however many sessions there are.
+    """
+    session = cookies.get(SESSION_COOKIE)
+    if session and len(session) <= 64:
+        return 'session:' + session
+    return address
+
+def session_id(cookies):
+    """(session id, is new): from the session cookie, or a fresh one"""
+    session = cookies.get(SESSION_COOKIE)
+    if session and len(session) <= 64:
+        return session, False
+    return secrets.token_urlsafe(16), True
+
+def seen_filter(session):
+    """skip(joke) for jokes this session has seen (None when dedupe is off)"""
+    if seen_jokes is None:
+        return None
+    return lambda joke: seen_jokes.seen(session, joke)
+
+def remember_joke(session, joke):
+    if seen_jokes is not None and joke:
+        seen_jokes.add(session, joke)
+
+def save_jokes(category, jokes):
+    """Queue generated jokes for the persistent store"""
+    if joke_store:
+        for joke in jokes:
+            joke_store.add(category, joke)
+
+def stored_jokes(category, count=1, skip=None):
+    """Up to count different saved jokes for a category (skip(joke) -> True to pass over)"""
+    if not joke_store:
+        return []
+    jokes = []
+    for _ in range(count * (5 if skip else 2)):
+        joke = joke_store.sample(category)
+        if joke is None:
+            break
+        if joke not in jokes and not (skip and skip(joke)) and check_safe(category, joke, 'store'):
+            jokes.append(joke)
+            if len(jokes) == count:
+                break
+    return jokes
+
+def stored_fallback(category, reason, skip=None):
+    """A saved joke standing in for a model joke (None if the store has none)"""
+    joke = next(iter(stored_jokes(category, skip=skip)), None)
+    if joke is None and skip:
+        # Every saved joke tried was a repeat; a repeat still beats no joke
+        joke = next(iter(stored_jokes(category)), None)
+    if joke is not None:
+        FALLBACKS.inc(category=category, reason=reason)
+    return joke
+
+def unavailable_fallback(category, skip=None):
+    """(joke, source) while the agent is down: a saved joke, else a local one, else (None, None)"""
+    joke = stored_fallback(category, 'agent_unavailable', skip)
+    if joke is not None:
+        return joke, 'store'
+    joke = local_joke(category, skip)
+    if joke is not None:
+        FALLBACKS.inc(category=category, reason='agent_unavailable')
+        return joke, 'local'
+    return None, None
+
+def unavailable_payload():
+    """(error payload, status, headers) when the agent is down and there is no stand-in joke"""
+    if agent_state == 'warming':
+        return ({'error': 'Still warming up. Try again in a few seconds!', 'success': False},
+                503, {'Retry-After': str(WARMUP_RETRY_AFTER)})
+    return {'error': 'Agent not initialized. Please check your AWS credentials.', 'success': False}, 500, {}
+
+def shed_payload(category, overloaded):
+    """Fallback joke sent when admission control sheds a request"""
+    pool_category = category if category in CATEGORY_PROMPTS else 'general'
+    joke = next(iter(stored_jokes(pool_category)), None) or FALLBACK_JOKE
+    FALLBACKS.inc(category=pool_category, reason=overloaded.reason)
+    return {
+        'joke': joke,
+        'category': category,
+        'success': True,
+        'fallback': True,
+        'reason': overloaded.reason
+    }
+
+def shed_response(payload, overloaded):
+    """JSON shed response with the right status and Retry-After header"""
+    response = jsonify(payload)
+    response.status_code = overloaded.status
+    response.headers['Retry-After'] = str(overloaded.retry_after)
+    return response
+
+def generate_for_pool(category, count):
+    """Joke pool refill: one call for one joke, a batch call for more"""
+    if count == 1:
+        return [ask_agent(category)]
+    return [record['joke'] for record in ask_agent_batch(category, count)]
+
+def parse_jokes(text):
+    """Parse a batch reply into [{'setup', 'punchline', 'joke'}, ...]
+    
+    Accepts the requested numbered Setup:/Punchline: format, and copes
+    with markdown bold, missing labels, a JSON array, or jokes separated
+    only by blank lines.
+    """
+    records = []
+    
+    # Some models answer with JSON no matter what they are asked
+    start, end = text.find('['), text.rfind(']')
+    if start != -1 and end > start:
+        try:
+            items = json.loads(text[start:end + 1])
+            for item in items:
+                if isinstance(item, dict) and item.get('setup'):
+                    records.append(make_joke_record(str(item['setup']), str(item.get('punchline', ''))))
+            if records:
+                return records
+        except ValueError:
+            pass
+    
+    text = re.sub(r'[*_]{2}', '', text)
+    if re.search(r'^\s*\d+\s*[.):]', text, re.MULTILINE):
+        blocks = re.split(r'^\s*\d+\s*[.):]\s*', text, flags=re.MULTILINE)[1:]
+    else:
+        blocks = re.split(r'\n\s*\n', text)
+    
+    for block in blocks:
+        block = block.strip()
+        if not block:
+            continue
+        labelled = re.match(r'(?is)^\s*setup\s*:\s*(.+?)\s*punch\s*line\s*:\s*(.+)$', block)
+        if labelled:
+            setup, punchline = labelled.group(1), labelled.group(2)
+        else:
+            setup, punchline = split_joke(block)
+        setup = ' '.join(setup.split())
+        punchline = ' '.join(punchline.split())
+        if setup:
+            records.append(make_joke_record(setup, punchline))
+    return records
+
+def make_joke_record(setup, punchline):
+    """Build one batch joke record"""
+    setup, punchline = setup.strip(), punchline.strip()
+    return {
+        'setup': setup,
+        'punchline': punchline,
+        'joke': f"{setup}\n{punchline}" if punchline else setup
+    }
+
+def stream_agent(category):
+    """Yield the agent's text chunks for one joke as they arrive"""
+    prompt = CATEGORY_PROMPTS.get(category, CATEGORY_PROMPTS['general'])
+    chunks = queue.Queue()
+    
+    async def pump(agent):
+        async for event in agent.stream_async(prompt):
+            if 'data' in event:
+                chunks.put(event['data'])
+            elif 'result' in event:
+                record_usage(category, 'stream', event['result'])
+    
+    def run():
+        # The agent streams on its own event loop; hand chunks over via the queue
+        try:
+            with agent_pool.checkout(timeout=AGENT_WAIT_TIMEOUT) as agent:
+                with model_call(category, 'stream'):
+                    asyncio.run(pump(agent))
+        except Exception as e:
+            chunks.put(e)
+        finally:
+            chunks.put(None)
+    
+    threading.Thread(target=run, daemon=True).start()
+    while True:
+        chunk = chunks.get()
+        if chunk is None:
+            return
+        if isinstance(chunk, Exception):
+            raise chunk
+        yield chunk
+
+def split_joke(text, final=True):
+    """Split joke text into (setup, punchline)
+    
+    The setup is the first non-empty line, or everything up to the first
+    question mark for one-line jokes. While streaming (final=False) returns
+    (None, None) until the end of the setup has arrived.
+    """
+    text = text.lstrip()
+    newline = text.find('\n')
+    if newline != -1:
+        return text[:newline].strip(), text[newline + 1:].strip()
+    question = text.find('?')
+    if question != -1 and (final or text[question + 1:].strip()):
+        return text[:question + 1].strip(), text[question + 1:].strip()
+    if final:
+        return text.strip(), ''
+    return None, None
+
+def sse_event(event, data):
+    """Format one server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+class JokeStream:
+    """Turns model chunks into the SSE events of /api/joke/stream"""
+    
+    def __init__(self, category):
+        self.category = category
+        self.text = ''
+        self.sent = 0
+        self.setup = None
+    
+    def add(self, chunk):
+        """Events for one model chunk: the token, plus the setup once complete
+        
+        With the safety filter on, the last word is held back until it is
+        complete and checked; raises UnsafeJoke when the text is blocked.
+        """
+        self.text += chunk
+        end = len(self.text)
+        if safety_filter is not None:
+            end = max(self.text.rfind(' '), self.text.rfind('\n')) + 1
+        return self._send(end)
+    
+    def flush(self):
+        """Events for any held-back text once the model is done"""
+        return self._send(len(self.text))
+    
+    def _send(self, end):
+        if end <= self.sent:
+            return []
+        category = self.category if self.category in CATEGORY_PROMPTS else 'general'
+        if safety_filter is not None and not check_safe(category, self.text[:end], 'stream'):
+            raise UnsafeJoke(category)
+        events = [sse_event('token', {'text': self.text[self.sent:end]})]
+        self.sent = end
+        if self.setup is None:
+            self.setup, _ = split_joke(self.text[:end], final=False)
+            if self.setup:
+                events.append(sse_event('setup', {'text': self.setup}))
+        return events
+    
+    def finish(self, joke=None):
+        """Closing events for the streamed text, or for a whole joke given at once"""
+        if joke is None:
+            joke = self.text.strip()
+        
+        # Ensure we have a proper joke format
+        if not joke:
+            joke = FALLBACK_JOKE
+            self.setup = None
+            category = self.category if self.category in CATEGORY_PROMPTS else 'general'
+            FALLBACKS.inc(category=category, reason='empty_response')
+        
+        events = []
+        if self.setup is None or not joke.startswith(self.setup):
+            # Nothing streamed, or a replacement for the streamed text
+            self.setup, punchline = split_joke(joke)
+            events.append(sse_event('setup', {'text': self.setup}))
+        else:
+            # Keep the punchline consistent with the setup already sent
+            punchline = joke[len(self.setup):].strip()
+        events.append(sse_event('punchline', {'text': punchline}))
+        events.append(sse_event('done', {'joke': joke, 'category': self.category, 'success': True}))
+        return events
+
+def initialize_store():
+    """Open the persistent joke store (skipped when JOKE_STORE_PATH is empty)"""
+    global joke_store
+    if not STORE_PATH:
+        return False
+    try:
+        legacy = os.path.join(BASE_DIR, 'jokes.db')
+        if STORE_PATH == DEFAULT_STORE_PATH and os.path.exists(legacy) and not os.path.exists(STORE_PATH):
+            # Older versions kept the store next to server.py, where it was downloadable
+            os.makedirs(DATA_DIR, exist_ok=True)
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(legacy + suffix):
+                    os.replace(legacy + suffix, STORE_PATH + suffix)
+            logger.info(f"Moved the joke store from {legacy} to {STORE_PATH}")
+        joke_store = JokeStore(STORE_PATH)
+        return True
+    except Exception as e:
+        logger.error(f"Failed to open joke store {STORE_PATH}: {e}")
+        return False
+
+def initialize_safety_filter():
+    """Load the blocklist (skipped when JOKE_BLOCKLIST_PATH is empty)"""
+    global safety_filter
+    if not BLOCKLIST_PATH:
+        return False
+    try:
+        safety_filter = SafetyFilter(BLOCKLIST_PATH)
+        return True
+    except Exception as e:
+        logger.error(f"Failed to load blocklist {BLOCKLIST_PATH}: {e}")
+        return False
+
+def initialize_pool():
+    """Create the joke pool and start filling it in the background"""
+    global joke_pool
+    joke_pool = JokePool(
+        generate_for_pool,
+        CATEGORY_PROMPTS,
+        depth=POOL_DEPTH,
+        low_water=POOL_LOW_WATER,
+        workers=POOL_WORKERS,
+        max_age=POOL_MAX_AGE,
+        batch=POOL_BATCH
+    )
+    joke_pool.fill_all()
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_time(response):
+    """Request latency up to the response headers (time to first byte for streams)"""
+    started = g.get('request_started')
+    if started is not None and request.endpoint != 'serve_static':
+        REQUEST_LATENCY.observe(time.perf_counter() - started,
+                                endpoint=request.endpoint or 'unknown', status=response.status_code)
+    return response
+
 @app.route('/')
 def serve_index():
     """Serve the main HTML file"""
-    return send_from_directory('.', 'index.html')
+    response = send_from_directory('.', 'index.html')
+    # Start the session here so the first joke request is already rate-limited per browser
+    session, new_session = session_id(request.cookies)
+    if new_session:
+        response.set_cookie(SESSION_COOKIE, session, httponly=True, samesite='Lax')
+    return response
+
+def is_public_file(filename):
+    """True only for web files outside the data directory (server state must not be served)"""
+    path = posixpath.normpath(filename.replace('\\', '/')).lstrip('/').lower()
+    return path.split('/', 1)[0] != 'data' and path.endswith(WEB_SUFFIXES)
 
 @app.route('/<path:filename>')
 def serve_static(filename):
     """Serve static files"""
+    if not is_public_file(filename):
+        return jsonify({'error': 'Not found'}), 404
     return send_from_directory('.', filename)
 
 @app.route('/api/joke', methods=['POST'])
 def generate_joke():
     """Generate a kid-friendly joke"""
-    global agent
-    
-    if agent is None:
-        return jsonify({'error': 'Agent not initialized. Please check your AWS credentials.'}), 500
-    
     try:
         data = request.get_json()
         category = data.get('category', 'general')
+        pool_category = category if category in CATEGORY_PROMPTS else 'general'
+        budget = request_budget(data)
+        admission.check_rate(rate_key(request.cookies, request.remote_addr))
+        session, new_session = session_id(request.cookies)
+        skip = seen_filter(session)
         
-        # Map categories to kid-friendly prompts
-        category_prompts = {
-            'general': 'Generate a funny, clean joke for kids about anything fun and silly.',
-            'animals': 'Generate a funny, clean joke for kids about animals.',
-            'food': 'Generate a funny, clean joke for kids about food.',
-            'school': 'Generate a funny, clean joke for kids about school.',
-            'knock-knock': 'Generate a knock-knock joke that kids will love.'
-        }
-        
-        prompt = category_prompts.get(category, category_prompts['general'])
-        
-        # Generate joke using the agent
-        response = agent(prompt)
-        
-        # Handle the response properly (it's an AgentResult object)
-        if hasattr(response, 'content'):
-            joke = response.content.strip()
-        else:
-            joke = str(response).strip()
+        # Serve a pre-generated joke when one is ready, otherwise ask live
+        joke = joke_pool.get(pool_category, skip) if joke_pool else None
+        if joke and not check_safe(pool_category, joke, 'pool'):
+            joke = None
+        source = 'pool'
+        if joke is None and agent_pool is None:
+            joke, source = unavailable_fallback(pool_category, skip)
+            if joke is None:
+                payload, status, headers = unavailable_payload()
+                return jsonify(payload), status, headers
+        if joke is None:
+            source = 'live'
+            try:
+                joke, source = hedged_joke(pool_category, skip, budget)
+            except Overloaded:
+                raise
+            except UnsafeJoke:
+                joke, source = safe_replacement(pool_category, skip)
+            except Exception as e:
+                # Bedrock is slow or down: serve a joke saved earlier instead
+                reason = 'deadline' if isinstance(e, TimeoutError) else 'model_error'
+                joke = stored_fallback(pool_category, reason, skip)
+                if joke is None:
+                    raise
+                source = 'store'
+                logger.warning(f"Serving a stored joke after model error: {e}")
         
         # Ensure we have a proper joke format
         if not joke:
-            joke = "Why don't scientists trust atoms? Because they make up everything! 😄"
+            joke = FALLBACK_JOKE
+            source = 'fallback'
+            FALLBACKS.inc(category=pool_category, reason='empty_response')
+        JOKES_SERVED.inc(endpoint='joke', category=pool_category, source=source)
+        remember_joke(session, joke)
         
-        return jsonify({
+        response = jsonify({
             'joke': joke,
             'category': category,
             'success': True
         })
+        if new_session:
+            response.set_cookie(SESSION_COOKIE, session, httponly=True, samesite='Lax')
+        return response
         
+    except Overloaded as e:
+        # Shed quickly with a fallback joke instead of queueing without limit
+        return shed_response(shed_payload(category, e), e)
     except Exception as e:
         logger.error(f"Error generating joke: {e}")
         return jsonify({
@@ -113,22 +906,211 @@ def generate_joke():
             'success': False
         }), 500
 
+@app.route('/api/joke/stream', methods=['GET', 'POST'])
+def stream_joke():
+    """Stream a kid-friendly joke as server-sent events
+    
+    Events: `token` for each model chunk, `setup` once the first line is
+    complete, then `punchline` and `done` with the whole joke.
+    """
+    if request.method == 'POST':
+        category = (request.get_json(silent=True) or {}).get('category', 'general')
+    else:
+        category = request.args.get('category', 'general')
+    pool_category = category if category in CATEGORY_PROMPTS else 'general'
+    session, new_session = session_id(request.cookies)
+    skip = seen_filter(session)
+    headers = {
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    }
+    
+    try:
+        admission.check_rate(rate_key(request.cookies, request.remote_addr))
+    except Overloaded as e:
+        # EventSource can't read error bodies, so shed with a normal stream
+        headers['Retry-After'] = str(e.retry_after)
+        return Response(shed_events(category, e), mimetype='text/event-stream', headers=headers)
+    
+    def events():
+        stream = JokeStream(category)
+        try:
+            # A pre-generated or saved joke needs no streaming
+            joke = joke_pool.get(pool_category, skip) if joke_pool else None
+            if joke and not check_safe(pool_category, joke, 'pool'):
+                joke = None
+            source = 'pool'
+            if joke is None and agent_pool is None:
+                joke, source = unavailable_fallback(pool_category, skip)
+                if joke is None:
+                    payload, _, headers = unavailable_payload()
+                    if headers:
+                        payload['retry_after'] = WARMUP_RETRY_AFTER
+                    yield sse_event('joke-error', payload)
+                    return
+            if joke is None:
+                source = 'live'
+                try:
+                    with admission.slot():
+                        for chunk in stream_agent(pool_category):
+                            yield from stream.add(chunk)
+                        yield from stream.flush()
+                except Overloaded as e:
+                    yield from shed_events(category, e)
+                    return
+                except UnsafeJoke:
+                    # Stop the model; 'done' carries a safe joke for the page to show instead
+                    joke, source = safe_replacement(pool_category, skip)
+                except Exception as e:
+                    # Nothing sent yet, so a saved joke can still stand in
+                    joke = None if stream.sent else stored_fallback(pool_category, 'model_error', skip)
+                    if joke is None:
+                        raise
+                    source = 'store'
+                    logger.warning(f"Serving a stored joke after model error: {e}")
+                else:
+                    save_jokes(pool_category, [stream.text.strip()])
+                    # Streamed text can't be taken back, so a repeat is only counted
+                    if skip and skip(stream.text):
+                        REPEATS.inc(category=pool_category, action='served')
+            yield from stream.finish(joke)
+            JOKES_SERVED.inc(endpoint='stream', category=pool_category, source=source)
+            remember_joke(session, joke or stream.text.strip())
+        
+        except Exception as e:
+            logger.error(f"Error streaming joke: {e}")
+            yield sse_event('joke-error', {
+                'error': 'Sorry, I had trouble thinking of a joke right now. Try again!',
+                'success': False
+            })
+    
+    response = Response(stream_with_context(events()), mimetype='text/event-stream', headers=headers)
+    if new_session:
+        response.set_cookie(SESSION_COOKIE, session, httponly=True, samesite='Lax')
+    return response
+
+def shed_events(category, overloaded):
+    """SSE events carrying a fallback joke for a shed request"""
+    payload = shed_payload(category, overloaded)
+    events = JokeStream(category).finish(payload['joke'])
+    # The final 'done' event carries the shed details
+    payload['retry_after'] = overloaded.retry_after
+    events[-1] = sse_event('done', payload)
+    return events
+
+@app.route('/api/jokes', methods=['GET', 'POST'])
+def generate_jokes():
+    """Generate several kid-friendly jokes with one model call"""
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+    else:
+        data = request.args
+    category = data.get('category', 'general')
+    pool_category = category if category in CATEGORY_PROMPTS else 'general'
+    
+    try:
+        count = int(data.get('count', 5))
+    except (TypeError, ValueError):
+        count = 0
+    if not 1 <= count <= BATCH_MAX:
+        return jsonify({
+            'error': f'count must be a number from 1 to {BATCH_MAX}',
+            'success': False
+        }), 400
+    
+    try:
+        admission.check_rate(rate_key(request.cookies, request.remote_addr))
+        source = 'live'
+        try:
+            if agent_pool is None:
+                raise RuntimeError('Agent not initialized')
+            with admission.slot():
+                jokes = ask_agent_batch(pool_category, count)
+        except Overloaded:
+            raise
+        except Exception as e:
+            # Bedrock is slow or down: serve jokes saved earlier instead
+            jokes = [make_joke_record(*split_joke(joke)) for joke in stored_jokes(pool_category, count)]
+            if not jokes:
+                raise
+            source = 'store'
+            FALLBACKS.inc(category=pool_category, reason='model_error')
+            logger.warning(f"Serving stored jokes after model error: {e}")
+        
+        # Ensure we have at least one proper joke
+        if not jokes:
+            jokes = [make_joke_record(*split_joke(FALLBACK_JOKE))]
+            source = 'fallback'
+            FALLBACKS.inc(category=pool_category, reason='empty_response')
+        JOKES_SERVED.inc(len(jokes), endpoint='jokes', category=pool_category, source=source)
+        
+        return jsonify({
+            'jokes': jokes,
+            'category': category,
+            'count': len(jokes),
+            'success': True
+        })
+        
+    except Overloaded as e:
+        payload = shed_payload(category, e)
+        payload['jokes'] = [make_joke_record(*split_joke(payload.pop('joke')))]
+        payload['count'] = 1
+        return shed_response(payload, e)
+    except Exception as e:
+        logger.error(f"Error generating jokes: {e}")
+        return jsonify({
+            'error': 'Sorry, I had trouble thinking of jokes right now. Try again!',
+            'success': False
+        }), 500
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus metrics"""
+    return Response(metrics.render(), mimetype=metrics.CONTENT_TYPE)
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({
-        'status': 'healthy',
-        'agent_initialized': agent is not None
-    })
+    return jsonify(health_status())
+
+def health_status():
+    """Health check payload (shared by both serving modes)"""
+    return {
+        'status': agent_state,
+        'backend': backend.name,
+        'agent_initialized': agent_pool is not None,
+        'agent_error': agent_error,
+        'agents': agent_pool.stats() if agent_pool else {},
+        'pool': joke_pool.sizes() if joke_pool else {},
+        'admission': admission.stats(),
+        'sessions': seen_jokes.stats() if seen_jokes else {}
+    }
 
 if __name__ == '__main__':
     print("🎭 Starting Kid's Joke Generator Server...")
     
-    # Initialize the agent
-    if initialize_agent():
-        print("✅ Agent initialized successfully!")
-        print("🚀 Server starting on http://localhost:8002") # Change port here: :XXXX
-        app.run(debug=False, host='0.0.0.0', port=8002)  # Change port here: port=XXXX
+    # Open the joke store first so saved jokes are available right away
+    if initialize_store():
+        print(f"💾 Joke store: {STORE_PATH}")
+    
+    # The safety filter must be in place before the first joke is generated
+    if initialize_safety_filter():
+        print(f"🛡️  Safety filter: {len(safety_filter.words)} blocked words from {BLOCKLIST_PATH}")
+        for word, entries in safety_filter.overblocked.items():
+            print(f"⚠️  Blocklist {', '.join(entries)} also blocks the harmless word '{word}'")
+    elif BLOCKLIST_PATH:
+        print(f"⚠️  Safety filter not loaded from {BLOCKLIST_PATH}; jokes are NOT being checked")
+    
+    # Import and warm up the agent in the background; the server starts now
+    print(f"🔥 Warming up the {backend.name} backend in the background...")
+    start_warmup()
+    
+    print("🚀 Server starting on http://localhost:8002") # Change port here: :XXXX
+    if SERVER_MODE == 'asgi' or '--asgi' in sys.argv:
+        # asgi_server does `import server`; make that this running module
+        sys.modules.setdefault('server', sys.modules[__name__])
+        import asgi_server
+        print("⚡ Async (ASGI) serving mode")
+        asgi_server.run(host='0.0.0.0', port=8002)  # Change port here: port=XXXX
     else:
-        print("❌ Failed to initialize agent. Please check your setup and try again.")
-        sys.exit(1)
\ No newline at end of file
+        app.run(debug=False, host='0.0.0.0', port=8002)  # Change port here: port=XXXX
\ No newline at end of file
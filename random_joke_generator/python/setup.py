@@ -2,11 +2,22 @@
 """
 Setup script for Kid's Joke Generator
 Helps users configure AWS credentials and test the setup
+
+With --bench it also measures cold start and call latency, writes a JSON
+report, and compares it against a saved baseline:
+    python setup.py --bench --calls 20 --concurrency 4
+    python setup.py --bench --save-baseline    # after a known-good run
 """
 
 import os
 import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 
 def print_banner():
     print("🎭" + "="*50 + "🎭")
@@ -117,8 +128,245 @@ def test_agent():
         print("- Network connectivity issues")
         return False
 
+# Lower is better for all of these except throughput; see compare_reports()
+BENCH_METRICS = [
+    ('imports.strands', 'import strands'),
+    ('imports.flask', 'import flask'),
+    ('agent_construction.first', 'first agent'),
+    ('agent_construction.p50', 'agent p50'),
+    ('first_call.first_token', 'first token'),
+    ('first_call.total', 'first call'),
+    ('sequential.p50', 'sequential p50'),
+    ('sequential.p95', 'sequential p95'),
+    ('sequential.p99', 'sequential p99'),
+    ('concurrent.p50', 'concurrent p50'),
+    ('concurrent.p95', 'concurrent p95'),
+    ('concurrent.p99', 'concurrent p99'),
+    ('concurrent.throughput', 'throughput'),
+]
+HIGHER_IS_BETTER = {'concurrent.throughput'}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Set up and check the Kid's Joke Generator")
+    parser.add_argument('--bench', action='store_true',
+                        help='measure cold start and call latency instead of the setup checks')
+    parser.add_argument('--calls', type=int, default=20, help='calls per sequential and concurrent run')
+    parser.add_argument('--concurrency', type=int, default=4, help='agents calling at once in the concurrent run')
+    parser.add_argument('--report', default='bench-report.json', help='where to write the JSON report')
+    parser.add_argument('--baseline', default='bench-baseline.json', help='report to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='save this run as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed slowdown against the baseline (0.2 = 20%%)')
+    parser.add_argument('--min-delta', type=float, default=0.005,
+                        help='ignore differences smaller than this many seconds')
+    return parser.parse_args()
+
+def percentile(values, pct):
+    """Nearest-rank percentile; None for no values"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+def latency_summary(timings, errors):
+    return {
+        'calls': len(timings) + errors,
+        'errors': errors,
+        'mean': sum(timings) / len(timings) if timings else None,
+        'p50': percentile(timings, 50),
+        'p95': percentile(timings, 95),
+        'p99': percentile(timings, 99),
+        'max': max(timings) if timings else None
+    }
+
+def measure_import(module, runs=3):
+    """Seconds to import a module in a fresh interpreter (None if it won't import)
+
+    Best of a few runs: a single cold import swings with disk cache and CPU noise.
+    """
+    code = ("import time; started = time.perf_counter(); import " + module +
+            "; print(time.perf_counter() - started)")
+    timings = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+        if result.returncode != 0:
+            return None
+        timings.append(float(result.stdout.strip().splitlines()[-1]))
+    return min(timings)
+
+def package_versions():
+    from importlib import metadata
+    versions = {}
+    for package in ('strands-agents', 'flask', 'boto3'):
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return versions
+
+def first_call(agent, prompt):
+    """Stream one call: seconds to the first text chunk and to the whole reply"""
+    async def run():
+        started = time.perf_counter()
+        first_token = None
+        async for event in agent.stream_async(prompt):
+            if 'data' in event and first_token is None:
+                first_token = time.perf_counter() - started
+        return first_token, time.perf_counter() - started
+    first_token, total = asyncio.run(run())
+    return {'first_token': first_token, 'total': total}
+
+def timed_calls(agent, prompts):
+    """Blocking calls on one agent; returns (latencies, error count)"""
+    timings = []
+    errors = 0
+    for prompt in prompts:
+        started = time.perf_counter()
+        try:
+            agent(prompt)
+        except Exception as e:
+            errors += 1
+            print(f"   ⚠️  Call failed: {e}")
+            continue
+        finally:
+            # Each server call starts from a fresh conversation
+            agent.messages.clear()
+        timings.append(time.perf_counter() - started)
+    return timings, errors
+
+def run_benchmark(calls, concurrency):
+    """Measure cold start and call latency against the configured backend"""
+    print("⏱️  Timing imports (fresh interpreter each)...")
+    imports = {module: measure_import(module) for module in ('strands', 'flask')}
+
+    # The server's own backend and prompts, so the numbers match what it serves
+    import server
+    prompts = list(server.CATEGORY_PROMPTS.values())
+    workload = [prompts[i % len(prompts)] for i in range(calls)]
+
+    print(f"🏗️  Building {concurrency} agent(s) with the {server.BACKEND_NAME} backend...")
+    construction = []
+    agents = []
+    for _ in range(concurrency):
+        started = time.perf_counter()
+        agents.append(server.build_agent())
+        construction.append(time.perf_counter() - started)
+
+    print("🥇 First call...")
+    first = first_call(agents[0], prompts[0])
+    agents[0].messages.clear()
+
+    print(f"🔁 {calls} sequential calls...")
+    timings, errors = timed_calls(agents[0], workload)
+    sequential = latency_summary(timings, errors)
+
+    print(f"🔀 {calls} calls over {concurrency} agents at once...")
+    shares = [workload[i::concurrency] for i in range(concurrency)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(timed_calls, agents, shares))
+    wall = time.perf_counter() - started
+    timings = [timing for result in results for timing in result[0]]
+    concurrent = latency_summary(timings, sum(result[1] for result in results))
+    concurrent.update(concurrency=concurrency, wall=wall,
+                      throughput=len(timings) / wall if wall else None)
+
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'backend': server.BACKEND_NAME,
+        'python': platform.python_version(),
+        'packages': package_versions(),
+        'imports': imports,
+        'agent_construction': {
+            'agents': concurrency,
+            'first': construction[0],
+            'p50': percentile(construction, 50)
+        },
+        'first_call': first,
+        'sequential': sequential,
+        'concurrent': concurrent
+    }
+
+def lookup(report, path):
+    value = report
+    for key in path.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+def compare_reports(report, baseline, tolerance, min_delta):
+    """Print each metric against the baseline; returns the names that regressed"""
+    regressions = []
+    print(f"\n📊 Against baseline from {baseline.get('created', 'unknown')}:")
+    for path, label in BENCH_METRICS:
+        now, before = lookup(report, path), lookup(baseline, path)
+        if now is None or before is None:
+            continue
+        unit = '/s' if path in HIGHER_IS_BETTER else 's'
+        change = (now - before) / before if before else 0.0
+        if path in HIGHER_IS_BETTER:
+            worse = now < before * (1 - tolerance)
+        else:
+            # Tiny absolute changes (an import going 3ms -> 4ms) are noise, not regressions
+            worse = now > before * (1 + tolerance) and now - before > min_delta
+        mark = '❌' if worse else '✅'
+        print(f"   {mark} {label:<16} {before:9.3f}{unit} -> {now:9.3f}{unit} ({change:+.0%})")
+        if worse:
+            regressions.append(label)
+    for run in ('sequential', 'concurrent'):
+        if lookup(report, f'{run}.errors') and not lookup(baseline, f'{run}.errors'):
+            print(f"   ❌ {run} calls failed ({lookup(report, f'{run}.errors')} errors)")
+            regressions.append(f'{run} errors')
+    return regressions
+
+def bench(args):
+    """--bench: measure, write the report, compare with the baseline"""
+    print("⏱️  Benchmark mode\n")
+    if os.environ.get('JOKE_BACKEND', 'bedrock').lower() == 'bedrock':
+        if not check_dependencies() or not check_aws_credentials():
+            sys.exit(1)
+        print()
+
+    try:
+        report = run_benchmark(max(1, args.calls), max(1, args.concurrency))
+    except Exception as e:
+        print(f"❌ Benchmark failed: {e}")
+        sys.exit(1)
+
+    with open(args.report, 'w') as handle:
+        json.dump(report, handle, indent=2)
+    print(f"\n📝 Report written to {args.report}")
+    for run in ('sequential', 'concurrent'):
+        summary = report[run]
+        if summary['p50'] is not None:
+            print(f"   {run}: p50 {summary['p50']:.3f}s  p95 {summary['p95']:.3f}s  "
+                  f"p99 {summary['p99']:.3f}s  ({summary['errors']} errors)")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as handle:
+            json.dump(report, handle, indent=2)
+        print(f"💾 Saved as the baseline: {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"\nℹ️  No baseline at {args.baseline} yet; run again with --save-baseline to keep this one.")
+        return
+    with open(args.baseline) as handle:
+        baseline = json.load(handle)
+    regressions = compare_reports(report, baseline, args.tolerance, args.min_delta)
+    if regressions:
+        print(f"\n⚠️  Slower than the baseline: {', '.join(regressions)}")
+        sys.exit(1)
+    print("\n🎉 No regressions against the baseline!")
+
 def main():
+    args = parse_args()
     print_banner()
+    if args.bench:
+        bench(args)
+        return
     
     # Check dependencies
     if not check_dependencies():
@@ -0,0 +1,27 @@
+"""Checks for the output safety filter (python -m pytest test_safety_filter.py)"""
+
+import os
+
+from safety_filter import SafetyFilter, normalize
+
+BLOCKLIST = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'blocklist.txt')
+
+
+def test_spaced_out_word_after_one_letter_word_is_blocked():
+    safety = SafetyFilter(BLOCKLIST)
+    assert safety.blocked("You are a l o s e r") == ['loser*']
+    assert safety.blocked("a s t u p i d joke") == ['stupid']
+    assert safety.blocked("I d i o t") == ['idiot*']
+
+
+def test_run_is_kept_whole_as_well():
+    assert normalize("a l o s e r") == 'aloser | a loser'
+    assert normalize("s h i t") == 'shit'
+
+
+def test_harmless_words_pass():
+    safety = SafetyFilter(BLOCKLIST)
+    assert safety.overblocked == {}
+    assert safety.is_safe("What do you call a root beer float that tells jokes? A pun-sicle!")
+    assert safety.is_safe("Why was the horse so calm in the stable? It had a stable mind!")
+    assert safety.is_safe("I am a cat")